@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .metrics import Metrics
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.admission")
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of being queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Service is overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the work a single worker process accepts.
+
+    At most `max_in_flight` requests run at once and at most `max_queued` wait for a
+    slot. Anything beyond that, or a request that waited longer than `max_queue_wait`
+    seconds, is rejected right away with a Retry-After estimate based on the recent
+    service time, so latency of the admitted requests stays bounded.
+    """
+
+    def __init__(self, metrics: Metrics, max_in_flight: int, max_queued: int, max_queue_wait: float):
+        self.metrics = metrics
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_queue_wait = max_queue_wait
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        # Exponentially weighted average of the time a request holds a slot
+        self._avg_service_time = 1.0
+
+    def retry_after(self) -> int:
+        """Estimated seconds until the current backlog is drained."""
+        backlog = (self._queued + self._in_flight + 1) / self.max_in_flight
+        return max(1, math.ceil(backlog * self._avg_service_time))
+
+    def is_full(self) -> bool:
+        return self._in_flight >= self.max_in_flight and self._queued >= self.max_queued
+
+    def reject_if_full(self) -> None:
+        """Raises Overloaded if the request would be shed without waiting."""
+        if self.is_full():
+            raise self._reject("queue_full")
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.metrics.increment("admission_rejected_total")
+        self.metrics.increment(f"admission_rejected_{reason}_total")
+        retry_after = self.retry_after()
+        logger.warning("Request rejected (%s), in flight: %d, queued: %d", reason, self._in_flight, self._queued)
+        return Overloaded(retry_after)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Holds a work slot for the duration of the block, raises Overloaded if the request is shed."""
+        self.reject_if_full()
+
+        self._queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout")
+        finally:
+            self._queued -= 1
+        self.metrics.observe("admission_queue_wait_seconds", time.perf_counter() - queued_at)
+        self.metrics.increment("admission_admitted_total")
+
+        self._in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            service_time = time.perf_counter() - started_at
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
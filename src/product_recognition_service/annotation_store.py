@@ -0,0 +1,387 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.annotation_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER REFERENCES sources(id) ON DELETE SET NULL,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    -- 0 for documents nobody annotated yet, e.g. imported with an empty "entits" placeholder
+    annotated INTEGER NOT NULL DEFAULT 1,
+    -- Store-wide counter bumped on every change of a document, see NEXT_REVISION_SQL
+    revision INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_documents_source_id ON documents(source_id);
+CREATE INDEX IF NOT EXISTS idx_documents_text_hash ON documents(text_hash);
+CREATE INDEX IF NOT EXISTS idx_documents_revision ON documents(revision);
+
+-- Entities are stored as imported, incomplete ones included; spans are only validated on export
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    start INTEGER,
+    end INTEGER,
+    label TEXT,
+    text TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_entities_document_id ON entities(document_id);
+-- Only "valid" entities are indexed, so progress counts never scan placeholder rows
+CREATE INDEX IF NOT EXISTS idx_entities_valid ON entities(document_id)
+    WHERE start != 0 OR end != 0 OR trim(text) != '';
+"""
+
+
+# Revision of the next document change. Evaluated inside the writing statement, so it is
+# assigned under SQLite's write lock and concurrent writers never get the same revision.
+NEXT_REVISION_SQL = "(SELECT COALESCE(MAX(revision), 0) + 1 FROM documents)"
+
+# SQL condition of an entity usable as a training span
+USABLE_SPAN_SQL = "start IS NOT NULL AND end IS NOT NULL AND end > start AND label IS NOT NULL AND label != ''"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _is_usable_span(entity: dict) -> bool:
+    start, end = entity.get("start"), entity.get("end")
+    return isinstance(start, int) and isinstance(end, int) and end > start and bool(entity.get("label"))
+
+
+class AnnotationStore:
+    """
+    An indexed local store for annotated documents backed by SQLite.
+
+    Documents, their entities and source URLs live in separate tables, so a single
+    document can be added or re-annotated without rewriting the whole corpus, and
+    consumers can stream documents instead of loading one big JSON file.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "AnnotationStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _get_or_create_source(self, url: str | None) -> int | None:
+        if not url:
+            return None
+        self.conn.execute("INSERT OR IGNORE INTO sources (url) VALUES (?)", (url,))
+        row = self.conn.execute("SELECT id FROM sources WHERE url = ?", (url,)).fetchone()
+        return row["id"]
+
+    def _insert_entities(self, document_id: int, entities: Iterable[dict]) -> None:
+        """Stores the entities as they are, without dropping incomplete ones."""
+        self.conn.executemany(
+            "INSERT INTO entities (document_id, start, end, label, text) VALUES (?, ?, ?, ?, ?)",
+            [
+                (document_id, entity.get("start"), entity.get("end"), entity.get("label"), entity.get("text") or "")
+                for entity in entities
+            ],
+        )
+
+    def add_document(self, text: str, source_url: str | None = None, entities: Iterable[dict] = ()) -> int:
+        """
+        Appends a single document with its entities and returns its id.
+
+        The document counts as annotated once it has an entity with a usable span.
+        """
+        entities = list(entities)
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO documents (source_id, text, text_hash, annotated, revision) "
+                f"VALUES (?, ?, ?, ?, {NEXT_REVISION_SQL})",
+                (
+                    self._get_or_create_source(source_url),
+                    text,
+                    _text_hash(text),
+                    any(_is_usable_span(entity) for entity in entities),
+                ),
+            )
+            self._insert_entities(cursor.lastrowid, entities)
+        return cursor.lastrowid
+
+    def find_document(self, text: str) -> int | None:
+        """Returns the id of a document with exactly this text, if there is one."""
+        for row in self.conn.execute("SELECT id, text FROM documents WHERE text_hash = ?", (_text_hash(text),)):
+            if row["text"] == text:
+                return row["id"]
+        return None
+
+    def set_entities(self, document_id: int, entities: Iterable[dict]) -> None:
+        """Replaces the entities of one document and marks it annotated (with no entities, as a negative example)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM entities WHERE document_id = ?", (document_id,))
+            self._insert_entities(document_id, entities)
+            self.conn.execute(
+                f"UPDATE documents SET annotated = 1, revision = {NEXT_REVISION_SQL}, updated_at = CURRENT_TIMESTAMP "
+                f"WHERE id = ?",
+                (document_id,),
+            )
+
+    def add_entities(self, document_id: int, entities: Iterable[dict]) -> None:
+        """Appends entities to one document, skipping the ones it already has."""
+        existing = {
+            (row["start"], row["end"], row["label"])
+            for row in self.conn.execute("SELECT start, end, label FROM entities WHERE document_id = ?", (document_id,))
+        }
+        new_entities = [
+            entity
+            for entity in entities
+            if (entity.get("start"), entity.get("end"), entity.get("label")) not in existing
+        ]
+        with self.conn:
+            self._insert_entities(document_id, new_entities)
+            self.conn.execute(
+                f"UPDATE documents SET annotated = annotated OR ?, revision = {NEXT_REVISION_SQL}, "
+                f"updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (any(_is_usable_span(entity) for entity in new_entities), document_id),
+            )
+
+    def _import_document(
+        self, text: str, source_url: str | None, entities: list[dict], annotated: bool, spans_only: bool = False
+    ) -> bool:
+        """
+        Adds a document, or updates the document with the same text.
+
+        An existing document gets the imported entities and annotated flag, unless the import
+        is unannotated and the document isn't, so a placeholder never overwrites annotations.
+        With `spans_only` (formats that only carry usable spans) its incomplete entities are kept.
+        Returns False if nothing changed, in that case its revision isn't bumped either.
+        """
+        document_id = self.find_document(text)
+        if document_id is None:
+            cursor = self.conn.execute(
+                f"INSERT INTO documents (source_id, text, text_hash, annotated, revision) "
+                f"VALUES (?, ?, ?, ?, {NEXT_REVISION_SQL})",
+                (self._get_or_create_source(source_url), text, _text_hash(text), annotated),
+            )
+            self._insert_entities(cursor.lastrowid, entities)
+            return True
+
+        row = self.conn.execute("SELECT annotated, source_id FROM documents WHERE id = ?", (document_id,)).fetchone()
+        if row["annotated"] and not annotated:
+            return False
+        if spans_only:
+            entities = entities + [e for e in self._get_entities(document_id) if not _is_usable_span(e)]
+        # Counters, as incomplete entities have None fields that can't be sorted
+        existing = Counter((e["start"], e["end"], e["label"], e["text"]) for e in self._get_entities(document_id))
+        imported = Counter((e.get("start"), e.get("end"), e.get("label"), e.get("text") or "") for e in entities)
+        if existing == imported and bool(row["annotated"]) == annotated:
+            return False
+        self.conn.execute("DELETE FROM entities WHERE document_id = ?", (document_id,))
+        self._insert_entities(document_id, entities)
+        self.conn.execute(
+            f"UPDATE documents SET annotated = ?, source_id = COALESCE(source_id, ?), "
+            f"revision = {NEXT_REVISION_SQL}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (annotated, self._get_or_create_source(source_url), document_id),
+        )
+        return True
+
+    def get_document(self, document_id: int) -> dict | None:
+        row = self.conn.execute(
+            "SELECT d.id, d.text, s.url FROM documents d LEFT JOIN sources s ON s.id = d.source_id WHERE d.id = ?",
+            (document_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "source_url": row["url"],
+            "text": row["text"],
+            "entities": self._get_entities(row["id"]),
+        }
+
+    def _get_entities(self, document_id: int) -> list[dict]:
+        return [
+            {"start": row["start"], "end": row["end"], "label": row["label"], "text": row["text"]}
+            for row in self.conn.execute(
+                "SELECT start, end, label, text FROM entities WHERE document_id = ? ORDER BY start, end",
+                (document_id,),
+            )
+        ]
+
+    def iter_documents(self) -> Iterator[dict]:
+        """
+        Streams all documents in the labeled_data.json layout, one row at a time.
+
+        Documents not annotated yet keep their entities under the "entits" placeholder key,
+        so importing the export again doesn't turn them into annotated ones.
+        """
+        cursor = self.conn.execute(
+            "SELECT d.id, d.text, d.annotated, s.url FROM documents d "
+            "LEFT JOIN sources s ON s.id = d.source_id ORDER BY d.id"
+        )
+        for row in cursor:
+            key = "entities" if row["annotated"] else "entits"
+            yield {"source_url": row["url"], "text": row["text"], key: self._get_entities(row["id"])}
+
+    def iter_spacy_examples(
+        self,
+        shuffle: bool = False,
+        revision_after: int | None = None,
+        revision_until: int | None = None,
+        limit: int | None = None,
+    ) -> Iterator[tuple[str, dict]]:
+        """
+        Streams documents in the spaCy training format: (text, {"entities": [[start, end, label], ...]}).
+
+        Only annotated documents are streamed and only entities with a usable span are included,
+        so unannotated documents never become negative examples.
+        `revision_after` / `revision_until` select documents by the revision of their last change
+        (as returned by `last_revision`), `limit` caps the number of documents - with `shuffle`
+        that is a random sample.
+        """
+        conditions = ["annotated = 1"]
+        params: list = []
+        if revision_after is not None:
+            conditions.append("revision > ?")
+            params.append(revision_after)
+        if revision_until is not None:
+            conditions.append("revision <= ?")
+            params.append(revision_until)
+        where = f"WHERE {' AND '.join(conditions)}"
+        order = "RANDOM()" if shuffle else "id"
+        query = f"SELECT id, text FROM documents {where} ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self.conn.execute(query, params):
+            entities = [
+                [entity_row["start"], entity_row["end"], entity_row["label"]]
+                for entity_row in self.conn.execute(
+                    f"SELECT start, end, label FROM entities WHERE document_id = ? AND {USABLE_SPAN_SQL} ORDER BY start",
+                    (row["id"],),
+                )
+            ]
+            yield row["text"], {"entities": entities}
+
+    def last_revision(self) -> int:
+        """Revision of the most recent document change, 0 for an empty store."""
+        return self.conn.execute("SELECT COALESCE(MAX(revision), 0) FROM documents").fetchone()[0]
+
+    def labels(self) -> list[str]:
+        return [
+            row["label"]
+            for row in self.conn.execute(f"SELECT DISTINCT label FROM entities WHERE {USABLE_SPAN_SQL} ORDER BY label")
+        ]
+
+    def count_documents(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def count_training_documents(self) -> int:
+        """Counts the annotated documents `iter_spacy_examples` streams."""
+        return self.conn.execute("SELECT COUNT(*) FROM documents WHERE annotated = 1").fetchone()[0]
+
+    def count_processed_documents(self) -> int:
+        """
+        Counts documents with at least one valid entity.
+
+        An entity is valid if start and end are not both 0 or it has a non-empty text.
+        """
+        return self.conn.execute(
+            "SELECT COUNT(DISTINCT document_id) FROM entities WHERE start != 0 OR end != 0 OR trim(text) != ''"
+        ).fetchone()[0]
+
+    # --- Importers / exporters for the existing JSON layouts ---
+
+    def import_labeled_json(self, input_path: Path) -> int:
+        """
+        Imports annotations in the labeled_data.json layout.
+
+        Accepts a list of {"source_url", "text", "entities"} entries (the older "entits" key
+        written by process_all_urls.py is accepted too) or a dict with a "sites" / "data" list.
+        All entities are stored as they are. An entry counts as annotated if it has an entity
+        with a usable span, or an empty "entities" list (a negative example); an "entits"
+        placeholder without usable spans doesn't. Documents already in the store (same text)
+        are updated instead of added again, so importing a file twice changes nothing.
+        Returns the number of added or changed documents.
+        """
+        with open(input_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("sites") or data.get("data") or [data]
+
+        count = 0
+        with self.conn:
+            for entry in data:
+                text = entry.get("text")
+                if not text:
+                    continue
+                entities = [e for e in entry.get("entities", entry.get("entits")) or [] if isinstance(e, dict)]
+                annotated = any(_is_usable_span(e) for e in entities) or entry.get("entities") == []
+                count += self._import_document(text, entry.get("source_url"), entities, annotated)
+        logger.info(f"Imported {count} new or changed documents from '{input_path}'")
+        return count
+
+    def import_spacy_json(self, input_path: Path) -> int:
+        """
+        Imports data in the spaCy training format written by convert_to_spacy_format.py.
+
+        Like `import_labeled_json`, documents already in the store are updated, not duplicated.
+        Returns the number of added or changed documents.
+        """
+        with open(input_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        count = 0
+        with self.conn:
+            for text, annotations in data:
+                entities = [
+                    {"start": start, "end": end, "label": label, "text": text[start:end]}
+                    for start, end, label in annotations.get("entities", [])
+                ]
+                count += self._import_document(text, None, entities, annotated=True, spans_only=True)
+        logger.info(f"Imported {count} new or changed documents from '{input_path}'")
+        return count
+
+    @staticmethod
+    def _write_json_stream(items: Iterable, output_path: Path) -> int:
+        """Writes a JSON list item by item, so the corpus never has to be held in memory."""
+        count = 0
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for item in items:
+                f.write(",\n" if count else "\n")
+                f.write(json.dumps(item, ensure_ascii=False))
+                count += 1
+            f.write("\n]\n")
+        return count
+
+    def export_labeled_json(self, output_path: Path) -> int:
+        count = self._write_json_stream(self.iter_documents(), output_path)
+        logger.info(f"Exported {count} documents to '{output_path}'")
+        return count
+
+    def export_spacy_json(self, output_path: Path) -> int:
+        count = self._write_json_stream(self.iter_spacy_examples(), output_path)
+        logger.info(f"Exported {count} documents to '{output_path}'")
+        return count
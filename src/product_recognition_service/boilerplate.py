@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .metrics import Metrics
+from .url_processor import normalize_url
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.boilerplate")
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Query parameters that only track where a visit came from, they never change the page
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = frozenset({"gclid", "fbclid", "msclkid", "yclid", "dclid", "igshid", "mc_cid", "mc_eid", "_ga", "ref"})
+
+
+def url_domain(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host.removeprefix("www.")
+
+
+def page_key(url: str) -> str:
+    """Key of a page in the domain sample: the normalized URL without tracking parameters."""
+    parts = urlsplit(normalize_url(url))
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def block_hash(block: str) -> str:
+    """Hash of a block's text, insensitive to case and whitespace differences."""
+    normalized = WHITESPACE_RE.sub(" ", block).strip().lower()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def count_tokens(blocks: list[str]) -> int:
+    """Rough token count (whitespace separated words), good enough to compare NER input sizes."""
+    return sum(len(block.split()) for block in blocks)
+
+
+class BoilerplateFilter:
+    """
+    Learns text blocks repeated across pages of the same domain and drops them.
+
+    For every domain a rolling sample of the last `window` distinct pages is kept as
+    sets of block hashes. A block is boilerplate (navigation, footer, cookie banner,
+    category menu...) once the domain has at least `min_pages` sampled pages and the
+    block occurs on at least `min_share` of them, on at least `min_pages` distinct paths.
+
+    Pages are keyed by `page_key`, so different spellings of a URL are one page, and
+    the path requirement keeps variants of one page (e.g. a product re-fetched with
+    different filters) from turning its own text into boilerplate.
+    """
+
+    def __init__(
+        self, metrics: Metrics, min_pages: int = 3, min_share: float = 0.6, window: int = 50, max_domains: int = 10000
+    ):
+        self.metrics = metrics
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.window = window
+        self.max_domains = max_domains
+        self._lock = threading.Lock()
+        # domain -> (page url -> block hashes of the page), oldest page first
+        self._pages: OrderedDict[str, OrderedDict[str, frozenset[str]]] = OrderedDict()
+        # domain -> number of sampled pages each block hash occurs on
+        self._counts: dict[str, Counter] = {}
+
+    def observe(self, url: str, blocks: list[str]) -> None:
+        """Adds a page to the domain sample. Revisiting a URL replaces its previous sample."""
+        domain = url_domain(url)
+        url = page_key(url)
+        hashes = frozenset(block_hash(block) for block in blocks)
+        with self._lock:
+            pages = self._pages.get(domain)
+            if pages is None:
+                pages = self._pages[domain] = OrderedDict()
+                self._counts[domain] = Counter()
+                if len(self._pages) > self.max_domains:
+                    evicted, _ = self._pages.popitem(last=False)
+                    del self._counts[evicted]
+            self._pages.move_to_end(domain)
+
+            counts = self._counts[domain]
+            previous = pages.pop(url, None)
+            if previous is not None:
+                counts.subtract(previous)
+            pages[url] = hashes
+            counts.update(hashes)
+            while len(pages) > self.window:
+                _, oldest = pages.popitem(last=False)
+                counts.subtract(oldest)
+            # Drop zero counts, so the counter doesn't grow with every block ever seen
+            counts += Counter()
+
+    def filter(self, url: str, blocks: list[str]) -> list[str]:
+        """Returns the blocks of the page that are not boilerplate of its domain."""
+        domain = url_domain(url)
+        with self._lock:
+            pages = self._pages.get(domain)
+            if not pages or len(pages) < self.min_pages:
+                return blocks
+            threshold = self.min_share * len(pages)
+            counts = self._counts[domain]
+            frequent = {block_hash(block) for block in blocks}
+            frequent = {hash_ for hash_ in frequent if counts[hash_] >= threshold}
+            if frequent:
+                # Only blocks repeated on enough distinct paths are boilerplate
+                paths: dict[str, set[str]] = {hash_: set() for hash_ in frequent}
+                for url, hashes in pages.items():
+                    path = urlsplit(url).path
+                    for hash_ in frequent & hashes:
+                        paths[hash_].add(path)
+                frequent = {hash_ for hash_, hash_paths in paths.items() if len(hash_paths) >= self.min_pages}
+            return [block for block in blocks if block_hash(block) not in frequent]
+
+    def remove_boilerplate(self, url: str, blocks: list[str], learn: bool = True) -> list[str]:
+        """
+        Learns from the page (unless `learn` is False) and returns its non-boilerplate blocks.
+
+        Records how many tokens were dropped from the NER input. If every block of the page
+        looks like boilerplate, the page is returned unchanged.
+        """
+        if learn:
+            self.observe(url, blocks)
+        kept = self.filter(url, blocks) or blocks
+
+        tokens_in = count_tokens(blocks)
+        tokens_removed = tokens_in - count_tokens(kept)
+        self.metrics.increment("boilerplate_tokens_in_total", tokens_in)
+        self.metrics.increment("boilerplate_tokens_removed_total", tokens_removed)
+        if tokens_in:
+            self.metrics.observe("boilerplate_token_reduction_ratio", tokens_removed / tokens_in)
+        if tokens_removed:
+            logger.debug("Removed %d/%d boilerplate tokens from '%s'", tokens_removed, tokens_in, url)
+        return kept
+
+    def save(self, path: Path) -> None:
+        with self._lock:
+            data = {
+                domain: {url: sorted(hashes) for url, hashes in pages.items()}
+                for domain, pages in self._pages.items()
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved boilerplate samples of {len(data)} domains to '{path}'")
+
+    def load(self, path: Path) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            for domain, pages in data.items():
+                domain_pages = self._pages.setdefault(domain, OrderedDict())
+                counts = self._counts.setdefault(domain, Counter())
+                for url, hashes in pages.items():
+                    url = page_key(url)
+                    previous = domain_pages.pop(url, None)
+                    if previous is not None:
+                        counts.subtract(previous)
+                    domain_pages[url] = frozenset(hashes)
+                    counts.update(domain_pages[url])
+                while len(domain_pages) > self.window:
+                    _, oldest = domain_pages.popitem(last=False)
+                    counts.subtract(oldest)
+                counts += Counter()
+        logger.info(f"Loaded boilerplate samples of {len(data)} domains from '{path}'")
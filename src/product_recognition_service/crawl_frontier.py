@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+
+from .url_processor import normalize_url
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.crawl_frontier")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    added_at REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_pending ON frontier(priority DESC, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_frontier_pending_host ON frontier(host, priority DESC, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_frontier_status ON frontier(status);
+
+-- 64-bit hashes of every normalized URL ever added, the rowid itself is the hash
+CREATE TABLE IF NOT EXISTS seen (hash INTEGER PRIMARY KEY);
+
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    pages INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Path fragments typical for product pages, in order of how strongly they suggest one
+PRODUCT_PATH_HINTS = ("/product", "/products/", "/p/", "/item", "/shop/", "/catalog", "/collections/", "/store/")
+# Links to these are never pages with product text
+SKIPPED_EXTENSIONS = frozenset(
+    {
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".pdf", ".zip", ".gz", ".mp4", ".mp3",
+        ".css", ".js", ".json", ".woff", ".woff2", ".ttf", ".xml",
+    }
+)
+SKIPPED_PATH_RE = re.compile(r"/(cart|checkout|login|account|register|wishlist|search)(/|$)", re.IGNORECASE)
+
+
+def url_hash(url: str) -> int:
+    """Signed 64-bit hash of a normalized URL, as stored in the seen set."""
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def url_priority(url: str, kind: str, depth: int) -> int:
+    """
+    Crawl priority of a URL, higher is crawled first.
+
+    Sitemaps come first, as they list many pages at once. Pages that look like product
+    pages, or were listed in a sitemap (depth 0 below a sitemap), rank above the rest;
+    deeper pages rank lower.
+    """
+    if kind == "sitemap":
+        return 100
+    path = urlsplit(url).path.lower()
+    priority = 50 - 5 * depth
+    for rank, hint in enumerate(PRODUCT_PATH_HINTS):
+        if hint in path:
+            priority += 30 - rank
+            break
+    return priority
+
+
+def is_crawlable_link(url: str) -> bool:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+    path = parts.path.lower()
+    if SKIPPED_PATH_RE.search(path):
+        return False
+    return Path(path).suffix not in SKIPPED_EXTENSIONS
+
+
+def sitemap_urls_for(homepage: str) -> list[str]:
+    """Default sitemap location of the site a homepage belongs to."""
+    parts = urlsplit(homepage)
+    return [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+
+
+def parse_sitemap(content: str) -> tuple[list[str], list[str]]:
+    """
+    Parses a sitemap or a sitemap index.
+
+    Returns the page URLs of a <urlset> and the nested sitemap URLs of a <sitemapindex>.
+    XML namespaces are ignored; content that isn't a sitemap gives two empty lists.
+    """
+    try:
+        root = ET.fromstring(content.strip())
+    except ET.ParseError:
+        return [], []
+
+    def local_name(tag: str) -> str:
+        return tag.rsplit("}", 1)[-1]
+
+    locations = [
+        element.text.strip()
+        for element in root.iter()
+        if local_name(element.tag) == "loc" and element.text and element.text.strip()
+    ]
+    if local_name(root.tag) == "sitemapindex":
+        return [], locations
+    if local_name(root.tag) == "urlset":
+        return locations, []
+    return [], []
+
+
+def extract_links(html: str, base_url: str, same_host: bool = True) -> list[str]:
+    """Returns the crawlable links of a page, resolved against its URL (only its own host by default)."""
+    soup = BeautifulSoup(html, "lxml")
+    base_host = (urlsplit(base_url).hostname or "").lower().removeprefix("www.")
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        url = urljoin(base_url, anchor["href"].strip())
+        if not is_crawlable_link(url):
+            continue
+        if same_host and (urlsplit(url).hostname or "").lower().removeprefix("www.") != base_host:
+            continue
+        links.append(url)
+    return links
+
+
+class HostThrottle:
+    """
+    Per-host politeness for the crawler threads.
+
+    At most `max_concurrent` requests run against a host at a time, and consecutive
+    requests to a host start at least `delay` seconds apart. Threads wait in `slot`
+    until their host allows another request.
+    """
+
+    def __init__(self, max_concurrent: int = 2, delay: float = 1.0):
+        self.max_concurrent = max_concurrent
+        self.delay = delay
+        self._condition = threading.Condition()
+        self._active: dict[str, int] = {}
+        self._next_start: dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._next_start.get(host, now) - now
+                if self._active.get(host, 0) < self.max_concurrent and wait <= 0:
+                    break
+                # Woken early when a request of the host finishes, re-checked either way
+                self._condition.wait(wait if wait > 0 else None)
+            self._active[host] = self._active.get(host, 0) + 1
+            self._next_start[host] = now + self.delay
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                    # Hosts whose delay already passed don't need to be remembered
+                    if self._next_start[host] <= time.monotonic():
+                        del self._next_start[host]
+                self._condition.notify_all()
+
+
+class CrawlFrontier:
+    """
+    A persistent crawl frontier backed by SQLite.
+
+    URLs are normalized and deduplicated against a seen set of 64-bit URL hashes kept on
+    disk (8 bytes per URL plus the b-tree overhead), so the set scales to millions of URLs
+    without living in memory. Pending URLs are handed out highest priority first; at most
+    `max_pages_per_host` pages are queued per host, so a single large site can't take over
+    the crawl. URLs claimed by a crawler that stopped are handed out again on the next start.
+    """
+
+    def __init__(self, db_path: Path, max_pages_per_host: int = 1000):
+        self.db_path = db_path
+        self.max_pages_per_host = max_pages_per_host
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # The connection is shared by the crawler threads, access is serialized by the lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            reclaimed = self.conn.execute(
+                "UPDATE frontier SET status = 'pending' WHERE status = 'in_progress'"
+            ).rowcount
+        if reclaimed:
+            logger.info(f"Re-queued {reclaimed} URLs left in progress by a previous crawl")
+
+    def __enter__(self) -> "CrawlFrontier":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def add_many(self, urls: list[str], kind: str = "page", depth: int = 0) -> int:
+        """Adds the URLs not seen before (after normalization). Returns the number of URLs added."""
+        now = time.time()
+        added = 0
+        with self._lock, self.conn:
+            for url in urls:
+                url = normalize_url(url)
+                if self.conn.execute("INSERT OR IGNORE INTO seen (hash) VALUES (?)", (url_hash(url),)).rowcount == 0:
+                    continue
+                host = urlsplit(url).netloc
+                if kind == "page":
+                    self.conn.execute("INSERT OR IGNORE INTO hosts (host) VALUES (?)", (host,))
+                    if self.conn.execute(
+                        "UPDATE hosts SET pages = pages + 1 WHERE host = ? AND pages < ?",
+                        (host, self.max_pages_per_host),
+                    ).rowcount == 0:
+                        continue
+                self.conn.execute(
+                    "INSERT INTO frontier (url, host, kind, depth, priority, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, host, kind, depth, url_priority(url, kind, depth), now),
+                )
+                added += 1
+        return added
+
+    def add(self, url: str, kind: str = "page", depth: int = 0) -> bool:
+        return self.add_many([url], kind, depth) == 1
+
+    def is_seen(self, url: str) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM seen WHERE hash = ?", (url_hash(normalize_url(url)),)).fetchone()
+        return row is not None
+
+    def claim(self, limit: int, per_host: int | None = None) -> list[dict]:
+        """
+        Hands out up to `limit` pending URLs, round-robin across hosts.
+
+        The batch takes the highest priority URL of every host, then the second one and so
+        on, so a single large host can't fill it; `per_host` caps the URLs of one host.
+        The URLs are returned in that interleaved order.
+        """
+        with self._lock, self.conn:
+            rows = self.conn.execute(
+                """
+                SELECT id, url, kind, depth, priority FROM (
+                    SELECT id, url, kind, depth, priority,
+                        ROW_NUMBER() OVER (PARTITION BY host ORDER BY priority DESC, id) AS host_rank
+                    FROM frontier WHERE status = 'pending'
+                )
+                WHERE ? IS NULL OR host_rank <= ?
+                ORDER BY host_rank, priority DESC, id
+                LIMIT ?
+                """,
+                (per_host, per_host, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE frontier SET status = 'in_progress' WHERE id = ?", [(row["id"],) for row in rows]
+            )
+        return [dict(row) for row in rows]
+
+    def complete(self, item_id: int, error: str | None = None) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET status = ?, error = ? WHERE id = ?",
+                ("failed" if error else "done", error, item_id),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {
+                f"{row['kind']}_{row['status']}": row["count"]
+                for row in self.conn.execute(
+                    "SELECT kind, status, COUNT(*) AS count FROM frontier GROUP BY kind, status"
+                )
+            }
+            counts["seen"] = self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+        return counts
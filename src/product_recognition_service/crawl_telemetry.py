@@ -0,0 +1,193 @@
+import json
+import socket
+import ssl
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import httpx
+
+# Stages of crawling a URL, in the order they happen
+STAGES = ("connect", "tls", "first_byte", "download", "parse", "write")
+
+# httpcore trace events (without the "connection." / "http11." / "http2." prefix) that start and end a stage.
+# Connecting includes the DNS lookup; first byte is from sending the request to receiving the response headers.
+HTTP_STAGE_STARTS = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "first_byte",
+    "receive_response_body": "download",
+}
+HTTP_STAGE_ENDS = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "receive_response_headers": "first_byte",
+    "receive_response_body": "download",
+}
+
+
+class CrawlTrace:
+    """
+    Timings and outcome of crawling one URL.
+
+    `on_http_event` is passed to httpx as the "trace" request extension and times the
+    network stages; the parse and write stages are timed with `stage`. Durations of a
+    stage repeated by redirects are added up.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.durations: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.status_code: int | None = None
+        self.bytes = 0
+        self.error_class: str | None = None
+        self.error: str | None = None
+        self._started_at = time.perf_counter()
+        self._stage_started: dict[str, float] = {}
+        self.total: float | None = None
+
+    def on_http_event(self, event_name: str, info: dict) -> None:
+        _, _, name = event_name.partition(".")
+        name, _, phase = name.rpartition(".")
+        now = time.perf_counter()
+        if phase == "started" and name in HTTP_STAGE_STARTS:
+            self._stage_started[HTTP_STAGE_STARTS[name]] = now
+        elif phase in ("complete", "failed") and name in HTTP_STAGE_ENDS:
+            started = self._stage_started.pop(HTTP_STAGE_ENDS[name], None)
+            if started is not None:
+                self.durations[HTTP_STAGE_ENDS[name]] += now - started
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] += time.perf_counter() - started
+
+    def fail(self, error_class: str, error: str | None = None) -> None:
+        self.error_class = error_class
+        self.error = error
+
+    def finish(self) -> dict:
+        """Stops the clock and returns the record of the URL."""
+        self.total = time.perf_counter() - self._started_at
+        return {
+            "url": self.url,
+            "host": urlsplit(self.url).netloc.lower(),
+            "ok": self.error_class is None,
+            "status_code": self.status_code,
+            "bytes": self.bytes,
+            "error_class": self.error_class,
+            "error": self.error,
+            "timings": {stage: round(seconds, 6) for stage, seconds in self.durations.items()},
+            "total": round(self.total, 6),
+        }
+
+
+def _exception_chain(exc: BaseException):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def classify_error(exc: BaseException) -> str:
+    """Maps a crawl exception to a failure class: dns, tls, connect_timeout, http_4xx, ..."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"http_{exc.response.status_code // 100}xx"
+    if isinstance(exc, httpx.TooManyRedirects):
+        return "too_many_redirects"
+    if isinstance(exc, UnicodeError):
+        return "decode_error"
+    if isinstance(exc, (httpx.InvalidURL, httpx.UnsupportedProtocol, ValueError)):
+        return "invalid_url"
+    if isinstance(exc, httpx.ConnectTimeout):
+        return "connect_timeout"
+    if isinstance(exc, httpx.TimeoutException):
+        return "read_timeout"
+    chain = list(_exception_chain(exc))
+    # httpx re-raises connection errors with the message only, the original may not be chained
+    message = str(exc).lower() if isinstance(exc, httpx.ConnectError) else ""
+    if any(isinstance(e, socket.gaierror) for e in chain) or "name or service not known" in message:
+        return "dns"
+    if any(isinstance(e, ssl.SSLError) for e in chain) or "ssl" in message or "certificate" in message:
+        return "tls"
+    if any(isinstance(e, ConnectionRefusedError) for e in chain):
+        return "connection_refused"
+    if isinstance(exc, httpx.ConnectError):
+        return "connect_error"
+    if isinstance(exc, (httpx.RemoteProtocolError, httpx.ReadError, httpx.WriteError)):
+        return "protocol_error"
+    if isinstance(exc, OSError):
+        return "os_error"
+    return "other"
+
+
+def _percentiles(values: list[float]) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 6)
+
+    return {
+        "count": len(ordered),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 6),
+        "sum": round(sum(ordered), 6),
+    }
+
+
+def build_report(records: list[dict], top_hosts: int = 50) -> dict:
+    """
+    Aggregates per-URL records: percentiles of every stage and of the total time, the
+    failure taxonomy and status codes, plus per-host percentiles for the `top_hosts`
+    hosts that took the most crawl time.
+    """
+    by_host: dict[str, list[dict]] = defaultdict(list)
+    for record in records:
+        by_host[record["host"]].append(record)
+
+    hosts = {}
+    for host, host_records in sorted(by_host.items(), key=lambda item: -sum(r["total"] for r in item[1]))[:top_hosts]:
+        stage_sums = {stage: sum(r["timings"][stage] for r in host_records) for stage in STAGES}
+        hosts[host] = {
+            "urls": len(host_records),
+            "failed": sum(not r["ok"] for r in host_records),
+            "errors": dict(Counter(r["error_class"] for r in host_records if r["error_class"])),
+            "total": _percentiles([r["total"] for r in host_records]),
+            "stages": {stage: _percentiles([r["timings"][stage] for r in host_records]) for stage in STAGES},
+            "slowest_stage": max(stage_sums, key=stage_sums.get),
+        }
+
+    return {
+        "urls": len(records),
+        "succeeded": sum(r["ok"] for r in records),
+        "failed": sum(not r["ok"] for r in records),
+        "errors": dict(Counter(r["error_class"] for r in records if r["error_class"]).most_common()),
+        "status_codes": dict(Counter(str(r["status_code"]) for r in records if r["status_code"]).most_common()),
+        "bytes": _percentiles([r["bytes"] for r in records if r["bytes"]]),
+        "total": _percentiles([r["total"] for r in records]),
+        "stages": {stage: _percentiles([r["timings"][stage] for r in records]) for stage in STAGES},
+        "hosts": hosts,
+    }
+
+
+def write_report(records: list[dict], records_path: Path, report_path: Path) -> dict:
+    """Writes the per-URL records as JSONL and the aggregated report as JSON. Returns the report."""
+    records_path.parent.mkdir(parents=True, exist_ok=True)
+    with records_path.open("w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    report = build_report(records)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with report_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
@@ -0,0 +1,34 @@
+import time
+
+STAGES = ("fetch", "parse", "ner")
+
+
+class Deadline:
+    """
+    A per-request time budget split between the fetch, parse and NER stages.
+
+    Each stage may use its share of the total budget plus whatever the previous stages
+    left unused, so that time reserved for the later stages is never spent early.
+    """
+
+    def __init__(self, seconds: float, shares: dict[str, float]):
+        self.seconds = seconds
+        total_share = sum(shares.get(stage, 0) for stage in STAGES) or 1
+        self.shares = {stage: shares.get(stage, 0) / total_share for stage in STAGES}
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_deadline(self, stage: str) -> float:
+        """The monotonic time by which the stage has to finish."""
+        later_stages = STAGES[STAGES.index(stage) + 1:]
+        reserved = sum(self.shares[later] for later in later_stages) * self.seconds
+        return self.expires_at - reserved
+
+    def stage_budget(self, stage: str) -> float:
+        """Seconds left for the stage."""
+        return max(0.0, self.stage_deadline(stage) - time.monotonic())
+
+    def stage_expired(self, stage: str) -> bool:
+        return time.monotonic() >= self.stage_deadline(stage)
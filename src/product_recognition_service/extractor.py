@@ -0,0 +1,79 @@
+import hashlib
+
+from spacy.language import Language
+from spacy.tokens import Doc
+
+PRODUCT_LABEL = "PRODUCT"
+# Model meta key of the unique id train.py gives every trained model (spaCy's name and version never change)
+MODEL_ID_META_KEY = "model_id"
+
+
+def model_version(nlp: Language) -> str:
+    """
+    Identifies a trained model, so results of different model releases are never mixed up.
+
+    Based on the id train.py stamps into the model meta, falling back to the meta name and
+    version for models without one. The same for the service and the offline scripts.
+    """
+    version = f"{nlp.meta.get('name', 'model')}-{nlp.meta.get('version', '0')}"
+    model_id = nlp.meta.get(MODEL_ID_META_KEY)
+    return f"{version}-{model_id}" if model_id else version
+
+
+def group_blocks(blocks: list[str], max_chars: int) -> list[list[str]]:
+    """
+    Groups consecutive page blocks into groups of roughly `max_chars` characters.
+
+    Blocks are never split, so a block longer than `max_chars` becomes a group on its own.
+    """
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_len = 0
+    for block in blocks:
+        if current and current_len + len(block) + 1 > max_chars:
+            groups.append(current)
+            current = []
+            current_len = 0
+        current.append(block)
+        current_len += len(block) + 1
+    if current:
+        groups.append(current)
+    return groups
+
+
+def chunk_blocks(blocks: list[str], max_chars: int) -> list[str]:
+    """Joins the groups of `group_blocks` into text chunks for the model."""
+    return [" ".join(group) for group in group_blocks(blocks, max_chars)]
+
+
+def text_block_hash(block: str) -> str:
+    """Exact hash of a block's text, the key of the per-block entity cache."""
+    return hashlib.blake2b(block.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_products(doc: Doc) -> list[str]:
+    """Returns the unique product names found in a processed document."""
+    return list(dict.fromkeys(ent.text for ent in doc.ents if ent.label_ == PRODUCT_LABEL))
+
+
+def get_block_products(doc: Doc, blocks: list[str]) -> list[list[str]]:
+    """
+    Splits the products of a chunk processed as `" ".join(blocks)` by the block they start in.
+
+    Returns the unique product names of every block, in block order.
+    """
+    block_ends = []
+    end = -1
+    for block in blocks:
+        end += len(block) + 1
+        block_ends.append(end)
+
+    products: list[dict[str, None]] = [{} for _ in blocks]
+    index = 0
+    for ent in doc.ents:
+        if ent.label_ != PRODUCT_LABEL:
+            continue
+        while index < len(blocks) - 1 and ent.start_char >= block_ends[index]:
+            index += 1
+        products[index][ent.text] = None
+    return [list(block_products) for block_products in products]
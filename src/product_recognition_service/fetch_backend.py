@@ -0,0 +1,145 @@
+import logging
+import re
+import time
+from pathlib import Path
+
+import httpx
+
+from .crawl_telemetry import CrawlTrace
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.fetch_backend")
+
+FETCH_MODES = ("live", "replay", "record")
+
+
+def url_to_filename_base(url: str) -> str:
+    """Converts the URL to a safe and valid base filename (without extension)."""
+    filename = url.replace("https://", "").replace("http://", "").replace("/", "_")
+    filename = re.sub(r'[\\/*?:"<>|]', "", filename)
+
+    return filename[:150]
+
+
+class LiveFetchBackend:
+    """Fetches pages over the network."""
+
+    def fetch(
+        self, url: str, headers: dict, time_limit: float | None = None, trace: CrawlTrace | None = None
+    ) -> str | None:
+        """
+        Fetches the HTML content from the URL.
+
+        With `time_limit` (seconds), the whole fetch - connect, redirects and download -
+        has to fit into it, otherwise httpx.TimeoutException is raised. With `trace`, the
+        network timings, status code and size of the response are recorded in it.
+        """
+        extensions = {"trace": trace.on_http_event} if trace else None
+        if time_limit is None:
+            timeout = httpx.Timeout(30.0, connect=10.0)
+        else:
+            timeout = httpx.Timeout(time_limit, connect=min(10.0, time_limit))
+
+        with httpx.Client(
+            headers=headers,
+            follow_redirects=True,
+            timeout=timeout,
+        ) as client:
+            if time_limit is None:
+                r = client.get(url, extensions=extensions)
+                if trace:
+                    trace.status_code = r.status_code
+                    trace.bytes = len(r.content)
+                r.raise_for_status()  # raises on 4xx/5xx
+
+                logger.debug("Successfully fetched %s", url)
+
+                return r.text
+
+            # httpx timeouts apply per network operation, the total is enforced while downloading
+            expires_at = time.monotonic() + time_limit
+            with client.stream("GET", url, extensions=extensions) as r:
+                if trace:
+                    trace.status_code = r.status_code
+                r.raise_for_status()  # raises on 4xx/5xx
+                chunks = []
+                for chunk in r.iter_bytes():
+                    if time.monotonic() > expires_at:
+                        raise httpx.ReadTimeout(f"Fetching {url} exceeded {time_limit:.1f}s", request=r.request)
+                    chunks.append(chunk)
+                if trace:
+                    trace.bytes = sum(len(chunk) for chunk in chunks)
+
+                logger.debug("Successfully fetched %s", url)
+
+                return b"".join(chunks).decode(r.encoding or "utf-8", errors="replace")
+
+
+class ReplayFetchBackend:
+    """
+    Serves pages from a local archive only, never touching the network.
+
+    The archive uses the layout written by URLProcessor.process: `<archive_dir>/<url filename base>.html`.
+    """
+
+    def __init__(self, archive_dir: Path):
+        self.archive_dir = archive_dir
+
+    def archive_path(self, url: str) -> Path:
+        return self.archive_dir / f"{url_to_filename_base(url)}.html"
+
+    def fetch(
+        self, url: str, headers: dict, time_limit: float | None = None, trace: CrawlTrace | None = None
+    ) -> str | None:
+        path = self.archive_path(url)
+        try:
+            if trace:
+                with trace.stage("download"):
+                    data = path.read_bytes()
+                trace.bytes = len(data)
+                html = data.decode("utf-8")
+            else:
+                html = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            logger.warning("No archived page for %s in '%s'", url, self.archive_dir)
+            if trace:
+                trace.fail("not_archived", f"No archived page at {path}")
+            return None
+        logger.debug("Replayed %s from '%s'", url, path)
+        return html
+
+
+class RecordFetchBackend(LiveFetchBackend):
+    """Fetches pages over the network and stores every response in the archive for later replay."""
+
+    def __init__(self, archive_dir: Path):
+        self.archive = ReplayFetchBackend(archive_dir)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+    def fetch(
+        self, url: str, headers: dict, time_limit: float | None = None, trace: CrawlTrace | None = None
+    ) -> str | None:
+        html = super().fetch(url, headers, time_limit, trace)
+        if html:
+            path = self.archive.archive_path(url)
+            try:
+                path.write_text(html, encoding="utf-8")
+            except IOError as e:
+                logger.error(f"Error writing to file {path}: {e}")
+        return html
+
+
+FetchBackend = LiveFetchBackend | ReplayFetchBackend | RecordFetchBackend
+
+
+def get_fetch_backend(mode: str, archive_dir: Path | None = None) -> FetchBackend:
+    """Creates the backend for a fetch mode: "live", "replay" or "record"."""
+    if mode == "live":
+        return LiveFetchBackend()
+    if archive_dir is None:
+        raise ValueError(f"Fetch mode '{mode}' requires an archive directory.")
+    if mode == "replay":
+        return ReplayFetchBackend(archive_dir)
+    if mode == "record":
+        return RecordFetchBackend(archive_dir)
+    raise ValueError(f"Unknown fetch mode '{mode}', expected one of: {', '.join(FETCH_MODES)}.")
@@ -0,0 +1,316 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from spacy.language import Language
+
+from .boilerplate import BoilerplateFilter
+from .extractor import PRODUCT_LABEL, chunk_blocks
+from .fetch_backend import FetchBackend
+from .metrics import metrics
+from .url_processor import URLProcessor
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.job_queue")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS job_items (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    claimed_at REAL,
+    claimed_by INTEGER,
+    products TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, id);
+CREATE INDEX IF NOT EXISTS idx_job_items_job_position ON job_items(job_id, position);
+"""
+
+
+def read_urls_from_csv_text(content: str) -> list[str]:
+    """Reads URLs from CSV content in the URL_list.csv layout: a header row, then one URL per row in the first column."""
+    reader = csv.reader(io.StringIO(content))
+    next(reader, None)  # Skip the header row
+    return [row[0].strip() for row in reader if row and row[0].strip()]
+
+
+class JobQueue:
+    """
+    A persistent local queue of bulk extraction jobs backed by SQLite.
+
+    A job is a list of URLs, every URL is a separate item. Workers claim pending items
+    in batches; a claim is a lease, so items held by a worker that died (or a service
+    that was restarted) are handed out again once the lease expires, or right away
+    by `reclaim_items` when the service starts.
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: float = 300):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # The connection is shared by the threadpool workers, access is serialized by the lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def create_job(self, urls: list[str]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, total, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, len(urls), time.time()),
+            )
+            self.conn.executemany(
+                "INSERT INTO job_items (job_id, position, url) VALUES (?, ?, ?)",
+                [(job_id, position, url) for position, url in enumerate(urls)],
+            )
+        logger.info(f"Created job '{job_id}' with {len(urls)} URLs")
+        return job_id
+
+    def claim_items(self, limit: int) -> list[dict]:
+        """Atomically claims up to `limit` pending (or abandoned) items, oldest first."""
+        now = time.time()
+        with self._lock, self.conn:
+            rows = self.conn.execute(
+                """
+                UPDATE job_items SET status = 'running', claimed_at = ?, claimed_by = ?
+                WHERE id IN (
+                    SELECT id FROM job_items
+                    WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?)
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING id, job_id, url
+                """,
+                (now, os.getpid(), now - self.lease_seconds, limit),
+            ).fetchall()
+            job_ids = {row["job_id"] for row in rows}
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ?",
+                [(now, job_id) for job_id in job_ids],
+            )
+        return [dict(row) for row in rows]
+
+    def reclaim_items(self) -> int:
+        """
+        Puts the running items back to pending if their lease expired or the process that
+        claimed them is gone. Call it before starting the workers of this process: its own
+        earlier claims are then left over from a previous run with the same pid.
+
+        Returns the number of reclaimed items.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            owners = [
+                row["claimed_by"]
+                for row in self.conn.execute("SELECT DISTINCT claimed_by FROM job_items WHERE status = 'running'")
+            ]
+            orphaned = [pid for pid in owners if pid is None or pid == os.getpid() or not _process_alive(pid)]
+            cursor = self.conn.execute(
+                f"""
+                UPDATE job_items SET status = 'pending', claimed_at = NULL, claimed_by = NULL
+                WHERE status = 'running' AND (
+                    claimed_at < ? OR claimed_by IS NULL OR claimed_by IN ({", ".join("?" * len(orphaned))})
+                )
+                """,
+                (now - self.lease_seconds, *orphaned),
+            )
+        if cursor.rowcount:
+            logger.info(f"Reclaimed {cursor.rowcount} job items left running by a stopped worker")
+        return cursor.rowcount
+
+    def complete_item(self, item_id: int, products: list[str] | None = None, error: str | None = None) -> None:
+        """Stores the result of an item (or its error) and finishes the job once all items are done."""
+        status = "failed" if error else "done"
+        counter = "failed" if error else "succeeded"
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                """
+                UPDATE job_items SET status = ?, products = ?, error = ?
+                WHERE id = ? AND status = 'running'
+                RETURNING job_id
+                """,
+                (status, json.dumps(products or [], ensure_ascii=False), error, item_id),
+            ).fetchone()
+            if row is None:
+                # Already completed by another worker after the lease expired
+                return
+            self.conn.execute(f"UPDATE jobs SET {counter} = {counter} + 1 WHERE id = ?", (row["job_id"],))
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = 'done', finished_at = ?
+                WHERE id = ? AND succeeded + failed >= total
+                """,
+                (time.time(), row["job_id"]),
+            )
+
+    def get_job(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        processed = row["succeeded"] + row["failed"]
+        elapsed = None
+        if row["started_at"]:
+            elapsed = (row["finished_at"] or time.time()) - row["started_at"]
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "total": row["total"],
+            "processed": processed,
+            "succeeded": row["succeeded"],
+            "failed": row["failed"],
+            "progress": round(processed / row["total"], 4) if row["total"] else 1.0,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "urls_per_second": round(processed / elapsed, 3) if elapsed else None,
+        }
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 100) -> list[dict]:
+        """Returns one page of the job items in submission order."""
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT position, url, status, products, error FROM job_items
+                WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?
+                """,
+                (job_id, offset, limit),
+            ).fetchall()
+        return [
+            {
+                "position": row["position"],
+                "url": row["url"],
+                "status": row["status"],
+                "products": json.loads(row["products"]) if row["products"] else [],
+                "error": row["error"],
+            }
+            for row in rows
+        ]
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+
+def _fetch_blocks(url: str, boilerplate: BoilerplateFilter | None, fetch_backend: FetchBackend | None) -> list[str]:
+    url_processor = URLProcessor(url, fetch_backend=fetch_backend)
+    html = url_processor._fetch_html()
+    blocks = URLProcessor._extract_blocks_from_html(html) if html else []
+    if not blocks:
+        raise ValueError("Could not retrieve or extract text from the URL.")
+    if boilerplate:
+        blocks = boilerplate.remove_boilerplate(url, blocks)
+    return blocks
+
+
+def _run_ner(nlp: Language, chunks: list[tuple[str, int]], batch_size: int) -> dict[int, list[str]]:
+    """Runs the model over (chunk, item index) pairs and returns the unique products of every item."""
+    products: dict[int, dict[str, None]] = {}
+    for doc, index in nlp.pipe(chunks, as_tuples=True, batch_size=batch_size):
+        item_products = products.setdefault(index, {})
+        for ent in doc.ents:
+            if ent.label_ == PRODUCT_LABEL:
+                item_products[ent.text] = None
+    return {index: list(item_products) for index, item_products in products.items()}
+
+
+async def run_job_worker(
+    job_queue: JobQueue,
+    nlp: Language,
+    batch_size: int,
+    poll_interval: float,
+    boilerplate: BoilerplateFilter | None = None,
+    fetch_backend: FetchBackend | None = None,
+    chunk_chars: int = 5000,
+) -> None:
+    """
+    Processes queued job items until cancelled.
+
+    Items are claimed in batches: pages of a batch are fetched concurrently, split into
+    chunks of about `chunk_chars` characters and then run through the model together
+    with `nlp.pipe`. If the batch fails, its pages are retried one by one, so only the
+    page that caused the failure fails.
+    """
+    while True:
+        items = await run_in_threadpool(job_queue.claim_items, batch_size)
+        if not items:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        fetched = await asyncio.gather(
+            *(run_in_threadpool(_fetch_blocks, item["url"], boilerplate, fetch_backend) for item in items),
+            return_exceptions=True,
+        )
+        ok_items = {}
+        chunks = []
+        for index, (item, result) in enumerate(zip(items, fetched)):
+            if isinstance(result, Exception):
+                logger.warning(f"Job '{item['job_id']}': failed to fetch '{item['url']}': {result}")
+                await run_in_threadpool(job_queue.complete_item, item["id"], None, str(result) or type(result).__name__)
+                continue
+            item_chunks = chunk_blocks(result, chunk_chars)
+            # A single block can still be longer than the model accepts
+            if any(len(chunk) > nlp.max_length for chunk in item_chunks):
+                logger.warning(f"Job '{item['job_id']}': '{item['url']}' has a block over {nlp.max_length} characters")
+                await run_in_threadpool(job_queue.complete_item, item["id"], None, "Page block too long for the model.")
+                continue
+            ok_items[index] = item
+            chunks.extend((chunk, index) for chunk in item_chunks)
+
+        try:
+            products = await run_in_threadpool(_run_ner, nlp, chunks, batch_size)
+        except Exception as e:
+            logger.exception(f"Batch inference failed, retrying its pages one by one: {e}")
+            products = {}
+            for index, item in ok_items.items():
+                try:
+                    products.update(
+                        await run_in_threadpool(_run_ner, nlp, [c for c in chunks if c[1] == index], batch_size)
+                    )
+                except Exception as e:
+                    logger.exception(f"Job '{item['job_id']}': inference failed for '{item['url']}': {e}")
+                    products[index] = None
+
+        for index, item in ok_items.items():
+            item_products = products.get(index, [])
+            if item_products is None:
+                await run_in_threadpool(job_queue.complete_item, item["id"], None, "Inference failed.")
+            else:
+                await run_in_threadpool(job_queue.complete_item, item["id"], item_products)
+        metrics.increment("job_items_processed_total", len(items))
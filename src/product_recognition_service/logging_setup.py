@@ -1,6 +1,160 @@
-import yaml
+import atexit
 import logging.config
+import logging.handlers
 import os
+import queue
+import random
+
+import yaml
+
+# Log records waiting for the background writers; beyond that records are dropped, not blocked on
+LOG_QUEUE_SIZE = 10000
+# Default number of characters of a payload (page text, etc.) written to the log
+DEFAULT_PAYLOAD_LIMIT = 1000
+
+_listeners: list[logging.handlers.QueueListener] = []
+_queue_handlers: list["BackgroundQueueHandler"] = []
+# (logger, original handler, queue handler) swaps made by start_background_logging
+_replaced_handlers: list[tuple[logging.Logger, logging.Handler, logging.Handler]] = []
+
+
+class TruncatedPayload:
+    """
+    Lazily formatted, size-limited view of a large log payload.
+
+    Nothing is converted to a string unless the record is actually emitted; lists and
+    tuples (e.g. page blocks) are joined only up to the limit.
+    """
+
+    def __init__(self, value, limit: int = DEFAULT_PAYLOAD_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        if isinstance(self.value, (list, tuple)):
+            parts = [str(part) for part in self.value]
+            total = sum(len(part) for part in parts) + max(len(parts) - 1, 0)
+            text = ""
+            for part in parts:
+                text = f"{text} {part}" if text else part
+                if len(text) > self.limit:
+                    break
+        else:
+            text = str(self.value)
+            total = len(text)
+        if total <= self.limit:
+            return text
+        return f"{text[:self.limit]}... [truncated, {total} chars total]"
+
+
+def truncate(value, limit: int = DEFAULT_PAYLOAD_LIMIT) -> TruncatedPayload:
+    return TruncatedPayload(value, limit)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes only `rate` of the records at or below `level`; more severe records always pass."""
+
+    def __init__(self, rate: float, level: int | str = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or random.random() < self.rate
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records over to a background writer thread.
+
+    Unlike the stock QueueHandler, the record is not formatted in the calling thread:
+    the message is built by the target handler's formatter in the writer thread. When
+    the queue is full the record is dropped (and counted) instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def load_logging_config(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rt') as f:
+        return yaml.safe_load(f.read())
+
+
+def _configured_loggers() -> list[logging.Logger]:
+    loggers = [logging.getLogger()]
+    loggers.extend(
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    )
+    return loggers
+
+
+def start_background_logging(config: dict | None = None) -> None:
+    """
+    Moves every configured handler behind a queue served by a background thread and
+    applies the per-logger sampling from the 'sampling' section of the logging config:
+
+        sampling:
+          <logger name>: {rate: 0.1, level: DEBUG}
+
+    The routing stays exactly as configured: each handler gets its own queue and writer,
+    and every logger that used it now uses the matching queue handler.
+    """
+    for name, options in ((config or {}).get("sampling") or {}).items():
+        logger = logging.getLogger(name)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        logger.addFilter(SamplingFilter(options.get("rate", 1.0), options.get("level", logging.DEBUG)))
+
+    queue_handlers: dict[logging.Handler, BackgroundQueueHandler] = {}
+    for logger in _configured_loggers():
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                continue
+            queue_handler = queue_handlers.get(handler)
+            if queue_handler is None:
+                queue_handler = BackgroundQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+                queue_handler.setLevel(handler.level)
+                listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+                listener.start()
+                _listeners.append(listener)
+                _queue_handlers.append(queue_handler)
+                queue_handlers[handler] = queue_handler
+            logger.removeHandler(handler)
+            logger.addHandler(queue_handler)
+            _replaced_handlers.append((logger, handler, queue_handler))
+
+
+def dropped_log_records() -> int:
+    """Number of records dropped because a background writer couldn't keep up."""
+    return sum(handler.dropped for handler in _queue_handlers)
+
+
+def stop_background_logging() -> None:
+    """Writes out all queued records, stops the writer threads and restores the original handlers."""
+    while _replaced_handlers:
+        logger, handler, queue_handler = _replaced_handlers.pop()
+        logger.removeHandler(queue_handler)
+        logger.addHandler(handler)
+    while _listeners:
+        _listeners.pop().stop()
+    _queue_handlers.clear()
+
+
+atexit.register(stop_background_logging)
+
 
 def setup_logging(default_path='logging_config.yaml', default_level=logging.INFO):
     """
@@ -8,13 +162,13 @@ def setup_logging(default_path='logging_config.yaml', default_level=logging.INFO
     """
     path = default_path
     if os.path.exists(path):
-        with open(path, 'rt') as f:
-            try:
-                config = yaml.safe_load(f.read())
-                logging.config.dictConfig(config)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-                logging.basicConfig(level=default_level)
+        try:
+            config = load_logging_config(path)
+            logging.config.dictConfig(config)
+            start_background_logging(config)
+        except Exception as e:
+            print(f"Error loading logging config: {e}")
+            logging.basicConfig(level=default_level)
     else:
         print("logging_config.yaml not found. Using basicConfig.")
-        logging.basicConfig(level=default_level)
\ No newline at end of file
+        logging.basicConfig(level=default_level)
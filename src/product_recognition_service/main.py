@@ -1,24 +1,96 @@
+import asyncio
+import json
 import logging
+import time
+import zlib
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Awaitable, Callable
 
+import httpx
 import spacy
-from fastapi import Depends, FastAPI, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic_settings import BaseSettings
 from spacy.language import Language
+from spacy.tokens import Doc
 
-from .url_processor import URLProcessor
+from .admission import AdmissionController, Overloaded
+from .boilerplate import BoilerplateFilter
+from .deadline import Deadline
+from .extractor import get_block_products, group_blocks, model_version, text_block_hash
+from .fetch_backend import get_fetch_backend
+from .job_queue import JobQueue, read_urls_from_csv_text, run_job_worker
+from .logging_setup import (
+    dropped_log_records,
+    load_logging_config,
+    start_background_logging,
+    stop_background_logging,
+    truncate,
+)
+from .metrics import metrics
+from .result_cache import ResultCache
+from .singleflight import FileLockSingleFlight, SingleFlight
+from .url_processor import URLProcessor, normalize_url
 
 # Get logger with a specific name that matches the one in logging_config.yaml
 logger = logging.getLogger("src.product_recognition_service.main")
 
+# Content-Encodings accepted for pages pushed to the ingestion endpoints
+INGEST_CONTENT_ENCODINGS = ("identity", "gzip", "deflate")
+
 class Settings(BaseSettings):
     """Manages application settings using Pydantic."""
     model_dir: Path = Path(__file__).resolve().parents[2] / "models" / "product_ner_model"
     templates_dir: Path = Path(__file__).resolve().parents[1] / "templates"
+    # Logging config whose handlers are moved to background writer threads on startup
+    log_config_path: Path = Path(__file__).resolve().parents[2] / "logging_config.yaml"
+    # Max size of a text chunk sent to the model at once
+    ner_chunk_chars: int = 5000
+    # End-to-end time limit of an extraction request in seconds (overridable per request
+    # up to max_request_deadline), split between the stages by the budget shares
+    request_deadline: float = 60.0
+    max_request_deadline: float = 300.0
+    fetch_budget_share: float = 0.5
+    parse_budget_share: float = 0.2
+    ner_budget_share: float = 0.3
+    # Directory for lock and result files shared by all workers on the host.
+    # When set, identical '/extract' requests are coalesced across workers too.
+    singleflight_dir: Path | None = None
+    # Persistent queue of bulk jobs submitted to '/jobs'
+    jobs_db_path: Path = Path(__file__).resolve().parents[2] / "data" / "jobs.db"
+    job_workers: int = 1
+    job_batch_size: int = 16
+    job_poll_interval: float = 1.0
+    # Admission control: per worker process, requests beyond the in-flight and queued
+    # budget (or waiting longer than max_queue_wait seconds) are rejected with 429
+    max_in_flight: int = 4
+    max_queued: int = 16
+    max_queue_wait: float = 10.0
+    # Boilerplate removal: blocks repeated on at least boilerplate_min_share of the last
+    # boilerplate_window sampled pages of a domain are dropped before NER. Samples are
+    # loaded from and saved to boilerplate_path (see src/scripts/learn_boilerplate.py).
+    boilerplate_enabled: bool = True
+    boilerplate_path: Path | None = Path(__file__).resolve().parents[2] / "data" / "processed" / "boilerplate.json"
+    boilerplate_min_pages: int = 3
+    boilerplate_min_share: float = 0.6
+    boilerplate_window: int = 50
+    # Recent '/extract' results, served even when the service is overloaded
+    result_cache_size: int = 1024
+    result_cache_ttl: float = 300.0
+    # Products found in each page block, keyed by the block's hash: on a later visit of a
+    # page only new or changed blocks go through the model
+    block_cache_size: int = 200000
+    block_cache_ttl: float = 86400.0
+    # Max (decompressed) size of a page pushed to '/extract/html' or '/extract/text'
+    max_ingest_bytes: int = 20 * 1024 * 1024
+    # Where pages come from: "live" fetches over the network, "replay" serves them only
+    # from fetch_archive_dir (saved by process_all_urls.py or "record"), "record" fetches
+    # over the network and saves every page to fetch_archive_dir
+    fetch_mode: str = "live"
+    fetch_archive_dir: Path = Path(__file__).resolve().parents[2] / "data" / "html_pages"
 
 settings = Settings()
 
@@ -28,21 +100,76 @@ async def lifespan(app: FastAPI):
     Handles startup and shutdown events.
     Loads the spaCy model on startup.
     """
+    # Log records are written by background threads, so logging never blocks the event loop
+    start_background_logging(load_logging_config(str(settings.log_config_path)))
     logger.info("Application startup...")
+    app.state.model_version = None
+    app.state.admission = AdmissionController(
+        metrics, settings.max_in_flight, settings.max_queued, settings.max_queue_wait
+    )
+    app.state.result_cache = ResultCache(settings.result_cache_size, settings.result_cache_ttl)
+    app.state.block_cache = ResultCache(settings.block_cache_size, settings.block_cache_ttl)
+    app.state.fetch_backend = get_fetch_backend(settings.fetch_mode, settings.fetch_archive_dir)
+    logger.info(f"Fetching pages in '{settings.fetch_mode}' mode.")
+    app.state.boilerplate = None
+    if settings.boilerplate_enabled:
+        app.state.boilerplate = BoilerplateFilter(
+            metrics, settings.boilerplate_min_pages, settings.boilerplate_min_share, settings.boilerplate_window
+        )
+        if settings.boilerplate_path and settings.boilerplate_path.exists():
+            try:
+                app.state.boilerplate.load(settings.boilerplate_path)
+            except (IOError, ValueError) as e:
+                logger.error(f"Could not load boilerplate samples from '{settings.boilerplate_path}': {e}")
+    if settings.singleflight_dir:
+        app.state.singleflight = FileLockSingleFlight(metrics, settings.singleflight_dir)
+    else:
+        app.state.singleflight = SingleFlight(metrics)
     try:
         if settings.model_dir.exists():
             app.state.nlp = spacy.load(settings.model_dir)
-            logger.info(f"Model loaded successfully from '{settings.model_dir}'.")
+            app.state.model_version = model_version(app.state.nlp)
+            logger.info(f"Model loaded successfully from '{settings.model_dir}' (version '{app.state.model_version}').")
         else:
             app.state.nlp = None
             logger.error(f"Model directory not found at '{settings.model_dir}'. The '/extract' endpoint will be unavailable.")
     except Exception as e:
         app.state.nlp = None
         logger.exception(f"Error loading model: {e}")
+
+    app.state.job_queue = JobQueue(settings.jobs_db_path)
+    job_workers = []
+    if app.state.nlp:
+        await run_in_threadpool(app.state.job_queue.reclaim_items)
+        job_workers = [
+            asyncio.create_task(
+                run_job_worker(
+                    app.state.job_queue,
+                    app.state.nlp,
+                    settings.job_batch_size,
+                    settings.job_poll_interval,
+                    app.state.boilerplate,
+                    app.state.fetch_backend,
+                    settings.ner_chunk_chars,
+                )
+            )
+            for _ in range(settings.job_workers)
+        ]
+        logger.info(f"Started {len(job_workers)} job worker(s).")
     
     yield
     
     logger.info("Application shutdown...")
+    for worker in job_workers:
+        worker.cancel()
+    await asyncio.gather(*job_workers, return_exceptions=True)
+    app.state.job_queue.close()
+    if app.state.boilerplate and settings.boilerplate_path:
+        try:
+            app.state.boilerplate.save(settings.boilerplate_path)
+        except IOError as e:
+            logger.error(f"Could not save boilerplate samples to '{settings.boilerplate_path}': {e}")
+    stop_background_logging()
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="Product Extractor API",
@@ -75,26 +202,449 @@ async def read_root(request: Request):
 @app.post("/extract")
 async def extract_products(
     nlp: NLP_DEPENDENCY,
-    url: str = Form(...)
+    url: str = Form(...),
+    deadline: float | None = Form(None, gt=0),
 ):
-    """Receives a URL, extracts text, and returns product entities."""
+    """
+    Receives a URL, extracts text, and returns product entities.
+
+    If the request deadline is hit while parsing or running NER, the products found
+    so far are returned with "partial": true.
+    """
+    request_deadline = _make_deadline(deadline)
     try:
-        url_processor = URLProcessor(url)
-        text = url_processor.extract_text_from_url()
-        if not text:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not retrieve or extract text from the URL. It might be down or blocking requests."
-            )
-        logger.debug(f"Extracted text: {text}")
+        key = _result_key(url)
+        products = app.state.result_cache.get(key)
+        if products is not None:
+            metrics.increment("result_cache_hits_total")
+            return JSONResponse(content={"products": products, "partial": False})
+
+        # Concurrent requests for the same page and model share one fetch + NER run
+        result = await app.state.singleflight.do(key, lambda: _admit_and_extract(nlp, url, key, request_deadline))
 
-        doc = nlp(text)
-        products = list(set([ent.text for ent in doc.ents if ent.label_ == "PRODUCT"]))
-        
-        return JSONResponse(content={"products": products})
+        return JSONResponse(content=result)
     except HTTPException as http_exc:
         logger.warning(f"Handled exception for URL '{url}': {http_exc.detail}")
         raise http_exc
     except Exception as e:
         logger.exception(f"An unexpected error occurred while processing URL '{url}': {e}")
-        raise HTTPException(status_code=500, detail="An internal server error occurred.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An internal server error occurred.")
+
+
+def _result_key(url: str) -> str:
+    return f"{app.state.model_version}|{normalize_url(url)}"
+
+
+def _make_deadline(seconds: float | None) -> Deadline:
+    seconds = min(seconds or settings.request_deadline, settings.max_request_deadline)
+    return Deadline(
+        seconds,
+        {
+            "fetch": settings.fetch_budget_share,
+            "parse": settings.parse_budget_share,
+            "ner": settings.ner_budget_share,
+        },
+    )
+
+
+def _overloaded_exception(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="The service is overloaded. Please retry later.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _admit_and_extract(nlp: Language, url: str, key: str, deadline: Deadline) -> dict:
+    """Runs the extraction within the admission budget and caches complete results."""
+    try:
+        async with app.state.admission.admit():
+            products, partial = await _extract_products_from_url(nlp, url, deadline)
+    except Overloaded as e:
+        raise _overloaded_exception(e)
+    if not partial:
+        app.state.result_cache.set(key, products)
+    return {"products": products, "partial": partial}
+
+
+async def _fetch_within_deadline(url_processor: URLProcessor, deadline: Deadline) -> str | None:
+    try:
+        return await run_in_threadpool(url_processor._fetch_html, deadline.stage_budget("fetch"))
+    except httpx.TimeoutException:
+        metrics.increment("deadline_timeouts_fetch_total")
+        raise HTTPException(status_code=504, detail="Timed out while fetching the URL.")
+
+
+async def _parse_within_deadline(url: str | None, html: str, deadline: Deadline) -> tuple[list[str], bool]:
+    """
+    Returns the page blocks without boilerplate and whether parsing was cut short by the deadline.
+
+    Boilerplate is learned per domain, so it is only removed when the page URL is known.
+    """
+    blocks = await run_in_threadpool(URLProcessor._extract_blocks_from_html, html, deadline.stage_deadline("parse"))
+    partial = deadline.stage_expired("parse")
+    if partial:
+        metrics.increment("deadline_timeouts_parse_total")
+    if url and app.state.boilerplate and blocks:
+        # Only complete pages are sampled, a cut-off page would skew the block statistics
+        blocks = app.state.boilerplate.remove_boilerplate(url, blocks, learn=not partial)
+    return blocks, partial
+
+
+async def _run_ner_within_deadline(
+    nlp: Language, chunks: list[str], deadline: Deadline
+) -> AsyncIterator[tuple[int, Doc]]:
+    """Runs NER chunk by chunk, yielding the processed doc of each; stops once the NER budget is spent."""
+    for index, chunk in enumerate(chunks):
+        budget = deadline.stage_budget("ner")
+        try:
+            if budget <= 0:
+                raise asyncio.TimeoutError
+            # A chunk already running in the threadpool can't be interrupted, but the request stops waiting for it
+            doc = await asyncio.wait_for(run_in_threadpool(nlp, chunk), timeout=budget)
+        except asyncio.TimeoutError:
+            metrics.increment("deadline_timeouts_ner_total")
+            logger.warning("NER stopped at the deadline after %d/%d chunks", index, len(chunks))
+            return
+        yield index, doc
+
+
+def _block_cache_key(block_key: str) -> str:
+    return f"{app.state.model_version}|{block_key}"
+
+
+def _plan_block_ner(blocks: list[str]) -> tuple[list[str], dict[str, list[str]], list[list[str]]]:
+    """
+    Looks up the products of the page blocks in the block cache.
+
+    Returns the hash of every block, the known products by block hash and the groups of
+    the remaining distinct blocks, which still have to go through the model.
+    """
+    block_keys = [text_block_hash(block) for block in blocks]
+    known: dict[str, list[str]] = {}
+    missing: dict[str, str] = {}
+    for block_key, block in zip(block_keys, blocks):
+        if block_key in known or block_key in missing:
+            continue
+        products = app.state.block_cache.get(_block_cache_key(block_key))
+        if products is None:
+            missing[block_key] = block
+        else:
+            known[block_key] = products
+    metrics.increment("ner_blocks_cached_total", len(known))
+    metrics.increment("ner_blocks_inferred_total", len(missing))
+    return block_keys, known, group_blocks(list(missing.values()), settings.ner_chunk_chars)
+
+
+async def _run_block_ner_within_deadline(
+    nlp: Language, groups: list[list[str]], deadline: Deadline
+) -> AsyncIterator[tuple[int, dict[str, list[str]]]]:
+    """Runs NER group by group, yielding and caching the products of each block by block hash."""
+    async for index, doc in _run_ner_within_deadline(nlp, [" ".join(group) for group in groups], deadline):
+        group = groups[index]
+        block_products = dict(zip(map(text_block_hash, group), get_block_products(doc, group)))
+        for block_key, products in block_products.items():
+            app.state.block_cache.set(_block_cache_key(block_key), products)
+        yield index, block_products
+
+
+def _page_products(block_keys: list[str], known: dict[str, list[str]]) -> tuple[list[str], bool]:
+    """Unique products of the page in block order, and whether some block has no products known yet."""
+    products: dict[str, None] = {}
+    partial = False
+    for block_key in block_keys:
+        block_products = known.get(block_key)
+        if block_products is None:
+            partial = True
+        else:
+            products.update(dict.fromkeys(block_products))
+    return list(products), partial
+
+
+async def _extract_products_from_url(nlp: Language, url: str, deadline: Deadline) -> tuple[list[str], bool]:
+    """
+    Fetches the page and runs NER over its text. Blocking work runs in the threadpool.
+
+    Returns the products and whether they are partial because the deadline was hit.
+    """
+    url_processor = URLProcessor(url, fetch_backend=app.state.fetch_backend)
+    html = await _fetch_within_deadline(url_processor, deadline)
+    blocks, partial = await _parse_within_deadline(url, html, deadline) if html else ([], False)
+    if not blocks and partial:
+        raise HTTPException(status_code=504, detail="Timed out while parsing the page.")
+    if not blocks:
+        raise HTTPException(
+            status_code=400,
+            detail="Could not retrieve or extract text from the URL. It might be down or blocking requests."
+        )
+    logger.debug("Extracted text: %s", truncate(blocks))
+
+    products, ner_partial = await _extract_products_from_blocks(nlp, blocks, deadline)
+    return products, partial or ner_partial
+
+
+async def _extract_products_from_blocks(nlp: Language, blocks: list[str], deadline: Deadline) -> tuple[list[str], bool]:
+    """
+    Runs NER over the page blocks not seen before, reusing the cached products of the rest.
+    Returns the products and whether NER was cut short.
+    """
+    block_keys, known, groups = _plan_block_ner(blocks)
+    async for _, block_products in _run_block_ner_within_deadline(nlp, groups, deadline):
+        known.update(block_products)
+    return _page_products(block_keys, known)
+
+
+async def _read_ingested_body(request: Request, bytes_metric: str) -> str:
+    """
+    Reads a page pushed by the client, decompressing a gzip or deflate Content-Encoding.
+
+    The decompressed size is capped by max_ingest_bytes, so a small compressed body
+    can't expand into an arbitrarily large one, and counted in `bytes_metric`.
+    """
+    # Reject before buffering the body, an overloaded server shouldn't read pages it won't process
+    try:
+        app.state.admission.reject_if_full()
+    except Overloaded as e:
+        raise _overloaded_exception(e)
+
+    content_encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if content_encoding not in INGEST_CONTENT_ENCODINGS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported Content-Encoding '{content_encoding}'. Use gzip, deflate or identity.",
+        )
+    # wbits=47 accepts both gzip and zlib wrapped data
+    decompressor = zlib.decompressobj(wbits=47) if content_encoding != "identity" else None
+    limit = settings.max_ingest_bytes
+    parts: list[bytes] = []
+    size = 0
+    try:
+        async for chunk in request.stream():
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk, limit - size + 1)
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=413, detail=f"The page is larger than {limit} bytes.")
+            parts.append(chunk)
+        if decompressor is not None:
+            parts.append(decompressor.flush())
+    except zlib.error:
+        raise HTTPException(status_code=400, detail=f"The body is not valid {content_encoding} data.")
+    metrics.increment(bytes_metric, sum(len(part) for part in parts))
+
+    charset = "utf-8"
+    for param in request.headers.get("content-type", "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset" and value.strip():
+            charset = value.strip().strip('"')
+    try:
+        return b"".join(parts).decode(charset, errors="replace")
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Unknown charset '{charset}'.")
+
+
+async def _admit_ingested(extract: Callable[[], Awaitable[tuple[list[str], bool]]]) -> JSONResponse:
+    try:
+        async with app.state.admission.admit():
+            products, partial = await extract()
+    except Overloaded as e:
+        raise _overloaded_exception(e)
+    return JSONResponse(content={"products": products, "partial": partial})
+
+
+@app.post("/extract/html")
+async def extract_products_from_html(
+    request: Request,
+    nlp: NLP_DEPENDENCY,
+    url: Annotated[str | None, Query()] = None,
+    deadline: Annotated[float | None, Query(gt=0)] = None,
+):
+    """
+    Extracts products from a page the client already downloaded, sent as the raw request
+    body (optionally gzip or deflate compressed). Skips the fetch; the optional source
+    'url' is used for boilerplate removal and logging only.
+    """
+    request_deadline = _make_deadline(deadline)
+    html = await _read_ingested_body(request, "ingested_html_bytes_total")
+
+    async def extract() -> tuple[list[str], bool]:
+        blocks, partial = await _parse_within_deadline(url, html, request_deadline)
+        if not blocks and partial:
+            raise HTTPException(status_code=504, detail="Timed out while parsing the page.")
+        if not blocks:
+            raise HTTPException(status_code=400, detail="Could not extract text from the page.")
+        products, ner_partial = await _extract_products_from_blocks(nlp, blocks, request_deadline)
+        return products, partial or ner_partial
+
+    return await _admit_ingested(extract)
+
+
+@app.post("/extract/text")
+async def extract_products_from_text(
+    request: Request,
+    nlp: NLP_DEPENDENCY,
+    url: Annotated[str | None, Query()] = None,
+    deadline: Annotated[float | None, Query(gt=0)] = None,
+):
+    """
+    Extracts products from already extracted page text sent as the raw request body
+    (optionally gzip or deflate compressed). Each non-empty line is a block. Skips the
+    fetch and the HTML parsing; the optional source 'url' is used for boilerplate removal.
+    Lines don't split the same way as HTML blocks, so the boilerplate filter doesn't learn from them.
+    """
+    request_deadline = _make_deadline(deadline)
+    text = await _read_ingested_body(request, "ingested_text_bytes_total")
+    blocks = [line.strip() for line in text.splitlines() if line.strip()]
+    if not blocks:
+        raise HTTPException(status_code=400, detail="The text is empty.")
+
+    async def extract() -> tuple[list[str], bool]:
+        if url and app.state.boilerplate:
+            return await _extract_products_from_blocks(
+                nlp, app.state.boilerplate.remove_boilerplate(url, blocks, learn=False), request_deadline
+            )
+        return await _extract_products_from_blocks(nlp, blocks, request_deadline)
+
+    return await _admit_ingested(extract)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    urls: Annotated[list[str] | None, Form()] = None,
+    file: Annotated[UploadFile | None, File()] = None,
+):
+    """
+    Queues a bulk extraction job and returns its id.
+
+    Takes URLs as repeated 'urls' form fields (each may hold several URLs, one per line)
+    and/or a CSV file in the URL_list.csv layout.
+    """
+    job_urls = [line.strip() for value in urls or [] for line in value.splitlines() if line.strip()]
+    if file is not None:
+        content = (await file.read()).decode("utf-8", errors="ignore")
+        job_urls.extend(read_urls_from_csv_text(content))
+    if not job_urls:
+        raise HTTPException(status_code=400, detail="No URLs given.")
+
+    job_id = await run_in_threadpool(app.state.job_queue.create_job, job_urls)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "total": len(job_urls)})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    """Returns the job progress, throughput and one page of its results."""
+    job = await run_in_threadpool(app.state.job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    job["results"] = await run_in_threadpool(app.state.job_queue.get_results, job_id, offset, limit)
+    job["offset"] = offset
+    job["limit"] = limit
+    return JSONResponse(content=job)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Returns the service counters and latency summaries."""
+    snapshot = metrics.snapshot()
+    snapshot["counters"]["log_records_dropped_total"] = dropped_log_records()
+    return JSONResponse(content=snapshot)
+
+
+def _ndjson_event(event: str, **payload) -> str:
+    return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+
+async def _stream_products(nlp: Language, url_processor: URLProcessor, deadline: Deadline) -> AsyncIterator[str]:
+    """Fetches and parses the page, then runs NER chunk by chunk, emitting NDJSON events as it goes."""
+    started = time.perf_counter()
+    url = url_processor.url
+    key = _result_key(url)
+    try:
+        async with app.state.admission.admit():
+            html = await _fetch_within_deadline(url_processor, deadline)
+            if not html:
+                yield _ndjson_event("error", detail="Could not retrieve the URL. It might be down or blocking requests.")
+                return
+            yield _ndjson_event("status", stage="fetched", bytes=len(html))
+
+            blocks, partial = await _parse_within_deadline(url, html, deadline)
+            if not blocks:
+                yield _ndjson_event("error", detail="Could not extract text from the URL.")
+                return
+            block_keys, known, groups = _plan_block_ner(blocks)
+            yield _ndjson_event(
+                "status", stage="parsed", blocks=len(blocks), chunks=len(groups), cached_blocks=len(known)
+            )
+
+            # Products of blocks already seen on an earlier visit come first, without NER
+            seen_products: dict[str, None] = dict.fromkeys(_page_products(block_keys, known)[0])
+            if seen_products:
+                yield _ndjson_event("products", chunk=None, products=list(seen_products), cached=True)
+            async for index, block_products in _run_block_ner_within_deadline(nlp, groups, deadline):
+                known.update(block_products)
+                chunk_products = dict.fromkeys(product for products in block_products.values() for product in products)
+                new_products = [product for product in chunk_products if product not in seen_products]
+                seen_products.update(dict.fromkeys(new_products))
+                if new_products:
+                    yield _ndjson_event("products", chunk=index, products=new_products)
+            products, ner_partial = _page_products(block_keys, known)
+            partial = partial or ner_partial
+
+        if not partial:
+            app.state.result_cache.set(key, products)
+        yield _ndjson_event(
+            "summary",
+            products=products,
+            chunks=len(groups),
+            partial=partial,
+            elapsed_ms=round((time.perf_counter() - started) * 1000),
+        )
+    except Overloaded as e:
+        yield _ndjson_event("error", detail="The service is overloaded. Please retry later.", retry_after=e.retry_after)
+    except HTTPException as e:
+        yield _ndjson_event("error", detail=e.detail)
+    except Exception as e:
+        # The response has already started, so errors are reported in-band
+        logger.exception(f"An unexpected error occurred while streaming URL '{url}': {e}")
+        yield _ndjson_event("error", detail="An internal server error occurred.")
+
+
+async def _stream_cached_products(products: list[str]) -> AsyncIterator[str]:
+    if products:
+        yield _ndjson_event("products", chunk=0, products=products)
+    yield _ndjson_event("summary", products=products, chunks=0, partial=False, elapsed_ms=0, cached=True)
+
+
+@app.post("/extract/stream")
+async def extract_products_stream(
+    nlp: NLP_DEPENDENCY,
+    url: str = Form(...),
+    deadline: float | None = Form(None, gt=0),
+):
+    """
+    Streaming variant of '/extract'. Responds with NDJSON events:
+    a status event after fetch and parse, a products event per chunk with newly
+    found products, and a final summary (or an error event).
+    """
+    request_deadline = _make_deadline(deadline)
+    try:
+        url_processor = URLProcessor(url, fetch_backend=app.state.fetch_backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    products = app.state.result_cache.get(_result_key(url))
+    if products is not None:
+        metrics.increment("result_cache_hits_total")
+        return StreamingResponse(_stream_cached_products(products), media_type="application/x-ndjson")
+
+    # Reject before the response starts, so the client gets a proper 429
+    try:
+        app.state.admission.reject_if_full()
+    except Overloaded as e:
+        raise _overloaded_exception(e)
+
+    return StreamingResponse(_stream_products(nlp, url_processor, request_deadline), media_type="application/x-ndjson")
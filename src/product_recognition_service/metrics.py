@@ -0,0 +1,61 @@
+import threading
+from collections import defaultdict, deque
+
+# Number of most recent observations kept per summary for the percentiles
+SUMMARY_WINDOW = 1024
+
+
+class Metrics:
+    """
+    A minimal in-process metrics registry.
+
+    Counters are plain monotonically increasing numbers keyed by name. Summaries keep
+    count, sum and max of all observations plus percentiles over a recent window. The
+    registry is thread-safe, so it can be updated both from the event loop and from
+    threadpool workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._summaries: dict[str, dict] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "max": 0.0, "window": deque(maxlen=SUMMARY_WINDOW)}
+                self._summaries[name] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["window"].append(value)
+
+    @staticmethod
+    def _percentile(ordered: list[float], q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            summaries = {}
+            for name, summary in sorted(self._summaries.items()):
+                ordered = sorted(summary["window"])
+                summaries[name] = {
+                    "count": summary["count"],
+                    "sum": round(summary["sum"], 6),
+                    "max": round(summary["max"], 6),
+                    "p50": round(self._percentile(ordered, 0.5), 6),
+                    "p99": round(self._percentile(ordered, 0.99), 6),
+                }
+            return {"counters": dict(sorted(self._counters.items())), "summaries": summaries}
+
+
+metrics = Metrics()
@@ -0,0 +1,150 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable
+
+from .metrics import Metrics
+
+# Get logger with a specific name that matches the one in logging_config.yaml
+logger = logging.getLogger("src.product_recognition_service.singleflight")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one shared computation.
+
+    The first caller for a key (the leader) starts the computation as a separate task,
+    every caller that arrives while it is running awaits the same task. The task is
+    shielded, so a caller going away doesn't cancel the work for the others.
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.metrics.increment("singleflight_leader_total")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.metrics.increment("singleflight_coalesced_total")
+            logger.debug("Coalesced request for key '%s'", key)
+        return await asyncio.shield(task)
+
+
+class FileLockSingleFlight(SingleFlight):
+    """
+    Single-flight shared between worker processes on the same host.
+
+    Calls are coalesced in-process first. Across workers, the leader holds an exclusive
+    lock on `<lock_dir>/<key hash>.lock` while computing and then writes the result next
+    to it. Workers that find the lock taken poll it without blocking a thread and reuse
+    that result instead of computing their own. Results must be JSON serializable.
+
+    The leader removes the lock file before releasing it; result files are only read by
+    the waiters of that computation and are removed once older than `result_ttl` seconds.
+    """
+
+    def __init__(self, metrics: Metrics, lock_dir: Path, poll_interval: float = 0.05, result_ttl: float = 60.0):
+        super().__init__(metrics)
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await super().do(key, lambda: self._do_cross_worker(key, fn))
+
+    async def _do_cross_worker(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        lock_path = self.lock_dir / f"{digest}.lock"
+        result_path = self.lock_dir / f"{digest}.json"
+        started = time.time()
+
+        lock_file, waited = await self._acquire(lock_path)
+        try:
+            if waited:
+                # Another worker computed this key while we waited
+                result = self._read_result(result_path, not_before=started)
+                if result is not None:
+                    self.metrics.increment("singleflight_coalesced_cross_worker_total")
+                    logger.debug("Reused result of another worker for key '%s'", key)
+                    return result["value"]
+            value = await fn()
+            self._write_result(result_path, value)
+            self._remove_expired_results()
+            return value
+        finally:
+            # Unlinked while still locked, so a worker can't lock a file that is about to go away unnoticed
+            lock_path.unlink(missing_ok=True)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    async def _acquire(self, lock_path: Path) -> tuple[IO, bool]:
+        """
+        Locks the lock file without blocking a thread, polling while another worker holds it.
+
+        Returns the locked file and whether the lock was held by another worker.
+        """
+        waited = False
+        while True:
+            lock_file = open(lock_path, "a+")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        waited = True
+                        await asyncio.sleep(self.poll_interval)
+                if self._is_current(lock_file, lock_path):
+                    return lock_file, waited
+            except BaseException:
+                lock_file.close()
+                raise
+            # The previous holder removed the file we locked, lock the one now at the path
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _is_current(lock_file: IO, lock_path: Path) -> bool:
+        try:
+            return os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _remove_expired_results(self) -> None:
+        expires_before = time.time() - self.result_ttl
+        for path in self.lock_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < expires_before:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _read_result(result_path: Path, not_before: float) -> dict | None:
+        """Reads a result written by another worker, only if it was written after `not_before`."""
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if result.get("written_at", 0) < not_before:
+            return None
+        return result
+
+    @staticmethod
+    def _write_result(result_path: Path, value: Any) -> None:
+        tmp_path = result_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"written_at": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, result_path)
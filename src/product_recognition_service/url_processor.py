@@ -1,13 +1,44 @@
 import logging
-import re
+import time
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString
+
+from .crawl_telemetry import CrawlTrace
+from .fetch_backend import FetchBackend, LiveFetchBackend, url_to_filename_base
 
 # Get logger with a specific name that matches the one in logging_config.yaml
 logger = logging.getLogger("src.product_recognition_service.url_processor")
 
+# Elements whose text is rendered as a separate block on the page
+BLOCK_TAGS = frozenset(
+    {
+        "address", "article", "aside", "blockquote", "body", "dd", "details", "dialog", "div", "dl", "dt",
+        "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+        "hr", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "td", "th", "tr", "ul",
+    }
+)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that different spellings of the same page compare equal.
+
+    Lowercases the scheme and host, drops default ports, the fragment and a trailing
+    slash, and sorts the query parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
 
 class URLProcessor:
     """
@@ -15,20 +46,31 @@ class URLProcessor:
 
     This class handles fetching HTML from a URL, extracting clean text content,
     and saving both the raw HTML and the extracted text to specified directories.
+    Pages are fetched through a fetch backend, so they can also be replayed from
+    (or recorded into) a local archive of saved HTML pages.
     """
 
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
 
-    def __init__(self, url: str, html_output_dir: Path | None = None, text_output_dir: Path | None = None):
+    def __init__(
+        self,
+        url: str,
+        html_output_dir: Path | None = None,
+        text_output_dir: Path | None = None,
+        fetch_backend: FetchBackend | None = None,
+    ):
         if not isinstance(url, str) or not url.startswith(("http://", "https://")):
             raise ValueError("A valid URL starting with http:// or https:// is required.")
-        logger.debug(f"Processing URL: {url}")
+        logger.debug("Processing URL: %s", url)
         self.url = url
         self.html_output_dir = html_output_dir
         self.text_output_dir = text_output_dir
+        self.html_content: str | None = None
         self.text_content: str | None = None
+        # Live network fetches unless a replay / record backend is given
+        self.fetch_backend = fetch_backend or LiveFetchBackend()
 
         self.file_name_base = self._url_to_filename_base()
 
@@ -39,25 +81,16 @@ class URLProcessor:
 
     def _url_to_filename_base(self) -> str:
         """Converts the URL to a safe and valid base filename (without extension)."""
-        filename = self.url.replace("https://", "").replace("http://", "").replace("/", "_")
-        filename = re.sub(r'[\\/*?:"<>|]', "", filename)
-
-        return filename[:150]
-
-    def _fetch_html(self) -> str | None:
-        """Fetches the HTML content from the URL."""
-
-        with httpx.Client(
-            headers=self.headers,
-            follow_redirects=True,
-            timeout=httpx.Timeout(30.0, connect=10.0),
-        ) as client:
-            r = client.get(self.url)
-            r.raise_for_status()  # raises on 4xx/5xx
+        return url_to_filename_base(self.url)
 
-            logger.debug(f"Successfully fetched {self.url}")
+    def _fetch_html(self, time_limit: float | None = None, trace: CrawlTrace | None = None) -> str | None:
+        """
+        Fetches the HTML content from the URL through the fetch backend.
 
-            return r.text
+        With `time_limit` (seconds), the whole fetch has to fit into it,
+        otherwise httpx.TimeoutException is raised.
+        """
+        return self.fetch_backend.fetch(self.url, self.headers, time_limit, trace)
 
     @staticmethod
     def _extract_text_from_html(html: str) -> str:
@@ -69,35 +102,88 @@ class URLProcessor:
         text = soup.get_text(separator=" ", strip=True)
         return text
 
-    def _save_content_to_file(self, content: str, output_path: Path) -> None:
-        """Saves the given content to a file."""
+    @staticmethod
+    def _extract_blocks_from_html(html: str, deadline: float | None = None) -> list[str]:
+        """
+        Extracts visible text from HTML content split into page blocks.
+
+        Consecutive strings sharing the nearest block-level ancestor form one block,
+        so joining the blocks with a space gives the same text as `_extract_text_from_html`.
+        If `deadline` (a time.monotonic() timestamp) passes, the blocks found so far are returned.
+        """
+        soup = BeautifulSoup(html, "lxml")
+        for script_or_style in soup(["script", "style"]):
+            script_or_style.decompose()
+
+        blocks: list[str] = []
+        current_parts: list[str] = []
+        current_block = None
+        for position, node in enumerate(soup.descendants):
+            if deadline is not None and position and position % 256 == 0 and time.monotonic() > deadline:
+                logger.warning("Parsing stopped at the deadline after %d blocks", len(blocks))
+                break
+            # Same string types as get_text() picks up (no comments, doctypes, etc.)
+            if type(node) not in (NavigableString, CData):
+                continue
+            string = node.strip()
+            if not string:
+                continue
+            block = next((parent for parent in node.parents if parent.name in BLOCK_TAGS), None)
+            if block is not current_block and current_parts:
+                blocks.append(" ".join(current_parts))
+                current_parts = []
+            current_block = block
+            current_parts.append(string)
+        if current_parts:
+            blocks.append(" ".join(current_parts))
+
+        return blocks
+
+    def _save_content_to_file(self, content: str, output_path: Path) -> bool:
+        """Saves the given content to a file. Returns False if it couldn't be written."""
         try:
             output_path.write_text(content, encoding="utf-8")
             logger.info(f"Successfully saved content to {output_path}")
+            return True
         except IOError as e:
             logger.error(f"Error writing to file {output_path}: {e}")
+            return False
 
-    def process(self) -> bool:
+    def process(self, trace: CrawlTrace | None = None) -> bool:
         """
         Fetch data from url, save HTML, extract text, save text.
 
+        With `trace`, the timings of every stage and the reason of a failure are recorded in it.
+
         Returns:
             True if the entire process was successful, False otherwise.
         """
-        html_content = self._fetch_html()
+        trace = trace or CrawlTrace(self.url)
+        html_content = self._fetch_html(trace=trace)
         if not html_content:
+            # The backend may have recorded a more specific reason, e.g. a page missing from the archive
+            if trace.error_class is None:
+                trace.fail("empty_page")
             return False
+        self.html_content = html_content
 
         if self.html_output_dir:
             html_file_path = self.html_output_dir / f"{self.file_name_base}.html"
-            self._save_content_to_file(html_content, html_file_path)
+            with trace.stage("write"):
+                if not self._save_content_to_file(html_content, html_file_path):
+                    trace.fail("write_error", f"Could not write {html_file_path}")
+                    return False
 
         if self.text_output_dir:
-            self.text_content = self._extract_text_from_html(html_content)
+            with trace.stage("parse"):
+                self.text_content = self._extract_text_from_html(html_content)
 
             text_with_source = f"{self.text_content}\n\nSource URL: {self.url}"
             text_file_path = self.text_output_dir / f"{self.file_name_base}.txt"
-            self._save_content_to_file(text_with_source, text_file_path)
+            with trace.stage("write"):
+                if not self._save_content_to_file(text_with_source, text_file_path):
+                    trace.fail("write_error", f"Could not write {text_file_path}")
+                    return False
 
         return True
 
@@ -0,0 +1,165 @@
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator
+
+import spacy
+
+from product_recognition_service.extractor import PRODUCT_LABEL, model_version
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+# Progress is printed every that many documents
+REPORT_EVERY = 500
+# Trailer URLProcessor.process appends to the saved text files, it is not part of the page text
+SOURCE_URL_TRAILER = "\n\nSource URL: "
+
+
+def iter_text_dir(text_dir: Path) -> Iterator[tuple[str, str]]:
+    """
+    Yields (document id, text) for every .txt file saved by process_all_urls.py.
+
+    The "Source URL:" trailer is cut off the text, as in the annotation data the model is
+    trained on, and its URL is the id. Files without the trailer are kept whole, the id is the file name.
+    """
+    for path in sorted(text_dir.glob("*.txt")):
+        content = path.read_text(encoding="utf-8", errors="ignore")
+        text, separator, url = content.rpartition(SOURCE_URL_TRAILER)
+        if separator and url.strip() and "\n" not in url.strip():
+            yield url.strip(), text
+        else:
+            yield path.name, content
+
+
+def iter_jsonl(jsonl_path: Path) -> Iterator[tuple[str, str]]:
+    """
+    Yields (document id, text) for every line of a JSONL file with a "text" field.
+
+    The id is taken from "id" or "source_url", falling back to the line number.
+    """
+    with jsonl_path.open("r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            doc_id = record.get("id") or record.get("source_url") or str(line_number)
+            yield str(doc_id), record.get("text") or ""
+
+
+def read_done_ids(output_path: Path, version: str) -> set[str]:
+    """
+    Returns the ids already scored by this model version in an existing output file.
+
+    A trailing line cut off by an interruption is removed from the file, so appending
+    to it afterwards keeps it valid JSONL.
+    """
+    if not output_path.exists():
+        return set()
+
+    done = set()
+    valid_size = 0
+    with output_path.open("rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid_size += len(line)
+            if record.get("model") == version:
+                done.add(record["id"])
+
+    if valid_size < output_path.stat().st_size:
+        print(f"Dropping an incomplete last record from '{output_path}'")
+        with output_path.open("r+b") as f:
+            f.truncate(valid_size)
+    return done
+
+
+def run_batch_inference(
+    model_dir: Path,
+    documents: Iterator[tuple[str, str]],
+    output_path: Path,
+    batch_size: int = 64,
+    n_process: int = 1,
+):
+    """
+    Runs the NER model over a stream of documents and appends the products to a JSONL file.
+
+    Every output line holds the document id, the model version and the products with their
+    character offsets. Documents already scored by the same model version are skipped, so an
+    interrupted run continues where it stopped when started again with the same output file.
+
+    Args:
+        model_dir: Directory of the trained spaCy model.
+        documents: (document id, text) pairs, read lazily.
+        output_path: The JSONL file the results are appended to.
+        batch_size: Number of texts buffered and processed together by `nlp.pipe`.
+        n_process: Number of processes `nlp.pipe` uses.
+    """
+    nlp = spacy.load(model_dir)
+    version = model_version(nlp)
+    done = read_done_ids(output_path, version)
+    if done:
+        print(f"Resuming: {len(done)} documents already scored by '{version}'")
+
+    skipped_too_long = []
+
+    def pending() -> Iterator[tuple[str, str]]:
+        for doc_id, text in documents:
+            if doc_id in done:
+                continue
+            if len(text) > nlp.max_length:
+                skipped_too_long.append(doc_id)
+                continue
+            yield text, doc_id
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    processed = 0
+    chars = 0
+    started = time.perf_counter()
+    with output_path.open("a", encoding="utf-8") as out:
+        for doc, doc_id in nlp.pipe(pending(), as_tuples=True, batch_size=batch_size, n_process=n_process):
+            products = [
+                {"text": ent.text, "start": ent.start_char, "end": ent.end_char}
+                for ent in doc.ents
+                if ent.label_ == PRODUCT_LABEL
+            ]
+            out.write(json.dumps({"id": doc_id, "model": version, "products": products}, ensure_ascii=False) + "\n")
+            processed += 1
+            chars += len(doc.text)
+            if processed % REPORT_EVERY == 0:
+                out.flush()
+                elapsed = time.perf_counter() - started
+                print(f"{processed} documents, {processed / elapsed:.1f} docs/sec")
+
+    elapsed = time.perf_counter() - started
+    print("--- Batch Inference Complete ---")
+    print(f"Scored {processed} documents in {elapsed:.1f}s with '{version}'")
+    if processed and elapsed:
+        print(f"Throughput: {processed / elapsed:.1f} docs/sec, {chars / elapsed / 1000:.1f}k chars/sec")
+    if skipped_too_long:
+        print(f"Skipped {len(skipped_too_long)} documents longer than {nlp.max_length} characters")
+    print(f"Results: '{output_path}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the NER model over stored texts and write products to JSONL.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--text-dir", type=Path, default=PROJECT_ROOT / "data" / "text_content", help="Directory of .txt files."
+    )
+    source.add_argument("--jsonl", type=Path, help="JSONL file with a 'text' field per line.")
+    parser.add_argument("--model-dir", type=Path, default=PROJECT_ROOT / "models" / "product_ner_model")
+    parser.add_argument("--output", type=Path, default=PROJECT_ROOT / "data" / "processed" / "predictions.jsonl")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    documents = iter_jsonl(args.jsonl) if args.jsonl else iter_text_dir(args.text_dir)
+    run_batch_inference(args.model_dir, documents, args.output, args.batch_size, args.n_process)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+HISTORY_PATH = PROJECT_ROOT / "data" / "benchmarks" / "crawl_benchmark.jsonl"
+# A run slower than the previous comparable run by more than this share is flagged
+REGRESSION_THRESHOLD = 0.1
+
+WORDS = ["Oak", "Table", "Velvet", "Sofa", "Lamp", "Chair", "Walnut", "Shelf", "Bed", "Desk", "with", "the", "new"]
+
+
+@dataclass
+class SimulatedWeb:
+    """Shape of the simulated web. Every host is a separate local port."""
+
+    hosts: int = 20
+    pages_per_host: int = 25
+    latency_ms: float = 50.0
+    latency_jitter_ms: float = 20.0
+    min_page_kb: int = 20
+    max_page_kb: int = 200
+    error_rate: float = 0.05
+    redirect_rate: float = 0.1
+    slow_hosts: int = 2
+    slow_factor: float = 10.0
+    seed: int = 42
+
+    def page_fate(self, host: int, page: int) -> tuple[str, float, int]:
+        """Deterministic (outcome, latency in seconds, body size) of a page: outcome is 'ok', 'error' or 'redirect'."""
+        rng = random.Random(f"{self.seed}-{host}-{page}")
+        roll = rng.random()
+        outcome = "error" if roll < self.error_rate else "redirect" if roll < self.error_rate + self.redirect_rate else "ok"
+        latency = max(0.0, rng.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000
+        if host < self.slow_hosts:
+            latency *= self.slow_factor
+        size = rng.randint(self.min_page_kb, self.max_page_kb) * 1024
+        return outcome, latency, size
+
+    def expected_failures(self) -> int:
+        return sum(
+            self.page_fate(host, page)[0] == "error" for host in range(self.hosts) for page in range(self.pages_per_host)
+        )
+
+
+def _page_body(host: int, page: int, size: int, links: str = "") -> bytes:
+    rng = random.Random(f"{host}-{page}")
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = f"<p>{' '.join(rng.choice(WORDS) for _ in range(40))}</p>"
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return f"<html><body><h1>Product {page}</h1>{links}{''.join(paragraphs)}</body></html>".encode()[:size]
+
+
+def _make_handler(web: SimulatedWeb, host: int, bytes_served):
+    class SimulatedHostHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/":
+                links = "".join(f'<a href="/page/{page}">Product {page}</a>' for page in range(web.pages_per_host))
+                return self._respond(200, _page_body(host, -1, 4096, links))
+            if path == "/sitemap.xml":
+                return self._respond(404, b"")
+            parts = path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] not in ("page", "moved") or not parts[1].isdigit():
+                return self._respond(404, b"")
+
+            page = int(parts[1])
+            outcome, latency, size = web.page_fate(host, page)
+            time.sleep(latency)
+            if outcome == "error":
+                return self._respond(500, b"Internal Server Error")
+            if outcome == "redirect" and parts[0] == "page":
+                self.send_response(301)
+                self.send_header("Location", f"/moved/{page}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            return self._respond(200, _page_body(host, page, size))
+
+        def _respond(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with bytes_served.get_lock():
+                bytes_served.value += len(body)
+
+        def log_message(self, *args):
+            pass
+
+    return SimulatedHostHandler
+
+
+def _serve_simulated_web(web: SimulatedWeb, ports, bytes_served, stop) -> None:
+    """Runs one HTTP server per simulated host until `stop` is set."""
+    servers = []
+    for host in range(web.hosts):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(web, host, bytes_served))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        ports.append(server.server_address[1])
+    stop.wait()
+    for server in servers:
+        server.shutdown()
+
+
+def _cpu_seconds() -> tuple[float, float]:
+    """CPU time (user + system) of this process and of its finished child processes."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+def _peak_memory_mb() -> tuple[float, float]:
+    """Peak resident memory in MB of this process and of the largest finished child process."""
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / scale, children / scale
+
+
+def _run_process_all_urls(homepages: list[str], web: SimulatedWeb, work_dir: Path) -> int:
+    from process_all_urls import process_all_urls
+
+    urls = [f"{homepage}page/{page}" for homepage in homepages for page in range(web.pages_per_host)]
+    annotation_file = work_dir / "annotations.json"
+    process_all_urls(urls, work_dir / "html", work_dir / "text", annotation_file)
+    if not annotation_file.exists():
+        return 0
+    with annotation_file.open("r", encoding="utf-8") as f:
+        return len(json.load(f))
+
+
+def _run_frontier_crawl(homepages: list[str], web: SimulatedWeb, work_dir: Path, workers: int) -> int:
+    from crawl import crawl, seed_frontier
+
+    from product_recognition_service.crawl_frontier import CrawlFrontier
+    from product_recognition_service.fetch_backend import LiveFetchBackend
+
+    with CrawlFrontier(work_dir / "frontier.db", max_pages_per_host=web.pages_per_host + 1) as frontier:
+        seed_frontier(frontier, homepages)
+        # The homepages are fetched too, only product pages are counted
+        return crawl(
+            frontier,
+            LiveFetchBackend(),
+            work_dir / "html",
+            work_dir / "text",
+            max_pages=web.hosts * (web.pages_per_host + 1),
+            max_depth=1,
+            workers=workers,
+            # Politeness would only measure the delay, every simulated host is local
+            max_per_host=workers,
+            host_delay=0.0,
+        ) - len(homepages)
+
+
+def run_benchmark(web: SimulatedWeb, crawler: str, workers: int = 8) -> dict:
+    """
+    Starts the simulated web in a separate process, crawls all its product pages and
+    returns the throughput and resource usage of the crawl.
+    """
+    context = multiprocessing.get_context("fork")
+    manager = context.Manager()
+    ports = manager.list()
+    bytes_served = context.Value("q", 0)
+    stop = context.Event()
+    server_process = context.Process(target=_serve_simulated_web, args=(web, ports, bytes_served, stop), daemon=True)
+    server_process.start()
+    while len(ports) < web.hosts:
+        time.sleep(0.05)
+    homepages = [f"http://127.0.0.1:{port}/" for port in ports]
+
+    total_pages = web.hosts * web.pages_per_host
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        bytes_before = bytes_served.value
+        cpu_before = _cpu_seconds()
+        started = time.perf_counter()
+        if crawler == "process_all_urls":
+            succeeded = _run_process_all_urls(homepages, web, work_dir)
+        else:
+            succeeded = _run_frontier_crawl(homepages, web, work_dir, workers)
+        elapsed = time.perf_counter() - started
+        cpu_after = _cpu_seconds()
+        transferred = bytes_served.value - bytes_before
+        # The server process is measured too, but only after the timed crawl
+        own_peak_mb, children_peak_mb = _peak_memory_mb()
+
+    stop.set()
+    server_process.join(timeout=10)
+    manager.shutdown()
+
+    crawler_cpu = (cpu_after[0] - cpu_before[0]) + (cpu_after[1] - cpu_before[1])
+    failures = total_pages - succeeded
+    expected_failures = web.expected_failures()
+    return {
+        "pages": total_pages,
+        "succeeded": succeeded,
+        "failures": failures,
+        "expected_failures": expected_failures,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(succeeded / elapsed, 2),
+        "megabytes_per_second": round(transferred / elapsed / 1024 / 1024, 2),
+        "cpu_seconds": round(crawler_cpu, 2),
+        "cpu_utilization": round(crawler_cpu / elapsed, 2),
+        "peak_memory_mb": round(own_peak_mb, 1),
+        "peak_child_memory_mb": round(children_peak_mb, 1),
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_result(history_path: Path, record: dict) -> dict | None:
+    """Appends the run to the history file and returns the previous run with the same crawler and config."""
+    previous = None
+    if history_path.exists():
+        with history_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["crawler"] == record["crawler"] and entry["config"] == record["config"]:
+                    previous = entry
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with history_path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return previous
+
+
+def main():
+    defaults = SimulatedWeb()
+    parser = argparse.ArgumentParser(description="Benchmark crawl throughput against a local simulated web.")
+    parser.add_argument("--crawler", choices=["process_all_urls", "frontier"], default="process_all_urls")
+    parser.add_argument("--workers", type=int, default=8, help="Threads of the frontier crawler.")
+    for field, value in asdict(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    args = parser.parse_args()
+
+    web = SimulatedWeb(**{field: getattr(args, field) for field in asdict(defaults)})
+    print(f"Simulated web: {asdict(web)}")
+    result = run_benchmark(web, args.crawler, args.workers)
+
+    print("--- Crawl Benchmark ---")
+    for name, value in result.items():
+        print(f"{name:>22}: {value}")
+    if result["failures"] != result["expected_failures"]:
+        print(f"WARNING: {result['failures']} failed pages, {result['expected_failures']} expected")
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "crawler": args.crawler,
+        "config": asdict(web),
+        "result": result,
+    }
+    previous = record_result(args.history, record)
+    if previous:
+        before = previous["result"]["pages_per_second"]
+        change = (result["pages_per_second"] - before) / before if before else 0.0
+        print(f"pages/sec vs previous run ({previous['revision']}, {previous['timestamp']}): {before} -> "
+              f"{result['pages_per_second']} ({change:+.1%})")
+        if change < -REGRESSION_THRESHOLD:
+            print(f"REGRESSION: throughput dropped more than {REGRESSION_THRESHOLD:.0%} against the previous run")
+            return 1
+    print(f"Result appended to '{args.history}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
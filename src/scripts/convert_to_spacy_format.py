@@ -2,6 +2,8 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+from product_recognition_service.annotation_store import AnnotationStore
+
 
 def convert_to_spacy_format(input_path: Path, output_path: Path):
     """
@@ -59,10 +61,29 @@ def convert_to_spacy_format(input_path: Path, output_path: Path):
         print(f"Error: Could not write data to file '{output_path}': {e}")
 
 
+def convert_store_to_spacy_format(db_path: Path, output_path: Path):
+    """
+    Streams annotations from the annotation store into the spaCy training format.
+
+    Documents are read and written one at a time, so the corpus is never loaded in full.
+    """
+    try:
+        with AnnotationStore(db_path) as store:
+            count = store.export_spacy_json(output_path)
+        print(f"Successfully converted {count} entries.")
+        print(f"Output saved to '{output_path}'")
+    except IOError as e:
+        print(f"Error: Could not write data to file '{output_path}': {e}")
+
+
 if __name__ == "__main__":
-    # By default, this script will look for 'new_annotation_data_22_entries.json'
-    # in the same directory and create 'spacy_training_data.json'.
+    # By default, this script reads the annotation store 'annotations.db' and falls back
+    # to 'labeled_data.json' if the store doesn't exist yet.
     project_root = Path(__file__).resolve().parents[2]
+    db_path = project_root / "data" / "processed" / "annotations.db"
     input_path = project_root / "data" / "processed" / "labeled_data.json"
     output_path = project_root / "data" / "processed" / f"spacy_training_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    convert_to_spacy_format(input_path, output_path)
+    if db_path.exists():
+        convert_store_to_spacy_format(db_path, output_path)
+    else:
+        convert_to_spacy_format(input_path, output_path)
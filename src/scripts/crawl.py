@@ -0,0 +1,148 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from product_recognition_service.crawl_frontier import (
+    CrawlFrontier,
+    HostThrottle,
+    extract_links,
+    is_crawlable_link,
+    parse_sitemap,
+    sitemap_urls_for,
+)
+from product_recognition_service.fetch_backend import FETCH_MODES, FetchBackend, get_fetch_backend
+from product_recognition_service.job_queue import read_urls_from_csv_text
+from product_recognition_service.url_processor import URLProcessor
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def crawl_item(
+    item: dict,
+    fetch_backend: FetchBackend,
+    html_dir: Path | None,
+    text_dir: Path,
+    max_depth: int,
+    throttle: HostThrottle,
+) -> tuple[list[str], list[str], str | None]:
+    """
+    Fetches one frontier item, once `throttle` allows another request to its host.
+
+    A sitemap is parsed for page and nested sitemap URLs. A page is saved like in
+    process_all_urls.py and its links are followed while it is above `max_depth`.
+
+    Returns:
+        A tuple containing:
+        - list[str]: Discovered page URLs.
+        - list[str]: Discovered sitemap URLs.
+        - str | None: The error if the item failed, otherwise None.
+    """
+    try:
+        if item["kind"] == "sitemap":
+            with throttle.slot(item["url"]):
+                content = fetch_backend.fetch(item["url"], URLProcessor.headers)
+            pages, sitemaps = parse_sitemap(content or "")
+            return [url for url in pages if is_crawlable_link(url)], sitemaps, None
+
+        processor = URLProcessor(item["url"], html_dir, text_dir, fetch_backend)
+        with throttle.slot(item["url"]):
+            processed = processor.process()
+        if not processed:
+            return [], [], "Could not retrieve the page"
+        if item["depth"] >= max_depth:
+            return [], [], None
+        return extract_links(processor.html_content, item["url"]), [], None
+    except Exception as e:
+        return [], [], f"{type(e).__name__}: {e}"
+
+
+def crawl(
+    frontier: CrawlFrontier,
+    fetch_backend: FetchBackend,
+    html_dir: Path | None,
+    text_dir: Path,
+    max_pages: int,
+    max_depth: int = 2,
+    workers: int = 8,
+    max_per_host: int = 2,
+    host_delay: float = 1.0,
+) -> int:
+    """
+    Crawls pages from the frontier until `max_pages` pages were fetched or it runs empty.
+
+    Items are claimed in batches and fetched by a pool of threads, the URLs they lead to
+    go back into the frontier. At most `max_per_host` requests run against a host at a
+    time, starting at least `host_delay` seconds apart. Returns the number of pages fetched.
+    """
+    if html_dir:
+        html_dir.mkdir(parents=True, exist_ok=True)
+    text_dir.mkdir(parents=True, exist_ok=True)
+
+    throttle = HostThrottle(max_per_host, host_delay)
+    pages_fetched = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pages_fetched < max_pages:
+            # Every host gets at most as many items as it may have requests in flight
+            items = frontier.claim(min(workers * 2, max_pages - pages_fetched), per_host=max_per_host)
+            if not items:
+                break
+            results = pool.map(
+                lambda item: crawl_item(item, fetch_backend, html_dir, text_dir, max_depth, throttle), items
+            )
+            for item, (pages, sitemaps, error) in zip(items, results):
+                frontier.add_many(sitemaps, kind="sitemap")
+                # Pages listed in a sitemap are entry points like the homepage, links are one level deeper
+                frontier.add_many(pages, depth=0 if item["kind"] == "sitemap" else item["depth"] + 1)
+                frontier.complete(item["id"], error)
+                if item["kind"] == "page" and not error:
+                    pages_fetched += 1
+            print(f"Fetched {pages_fetched} pages, frontier: {frontier.stats()}")
+    return pages_fetched
+
+
+def seed_frontier(frontier: CrawlFrontier, homepages: list[str]) -> int:
+    """Adds the homepages and their sitemaps. URLs already seen by an earlier run are skipped."""
+    added = frontier.add_many(homepages)
+    added += frontier.add_many([url for homepage in homepages for url in sitemap_urls_for(homepage)], kind="sitemap")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl product pages of the stores in a CSV file.")
+    parser.add_argument("--csv", type=Path, default=PROJECT_ROOT / "data" / "URL_list.csv")
+    parser.add_argument("--frontier-db", type=Path, default=PROJECT_ROOT / "data" / "crawl" / "frontier.db")
+    parser.add_argument("--max-pages", type=int, default=1000, help="Pages to fetch in this run.")
+    parser.add_argument("--max-depth", type=int, default=2, help="Link hops followed from a homepage or sitemap.")
+    parser.add_argument("--max-pages-per-host", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-per-host", type=int, default=2, help="Concurrent requests per host.")
+    parser.add_argument("--host-delay", type=float, default=1.0, help="Seconds between requests to a host.")
+    parser.add_argument("--fetch-mode", choices=FETCH_MODES, default="live")
+    parser.add_argument("--archive-dir", type=Path, default=PROJECT_ROOT / "data" / "html_pages")
+    parser.add_argument("--text-dir", type=Path, default=PROJECT_ROOT / "data" / "text_content")
+    args = parser.parse_args()
+
+    fetch_backend = get_fetch_backend(args.fetch_mode, args.archive_dir)
+    # In replay mode the archive is only read, in record mode the backend writes it
+    html_dir = None if args.fetch_mode in ("replay", "record") else args.archive_dir
+
+    with CrawlFrontier(args.frontier_db, args.max_pages_per_host) as frontier:
+        homepages = read_urls_from_csv_text(args.csv.read_text(encoding="utf-8", errors="ignore"))
+        print(f"Added {seed_frontier(frontier, homepages)} new seed URLs")
+        pages = crawl(
+            frontier,
+            fetch_backend,
+            html_dir,
+            args.text_dir,
+            args.max_pages,
+            args.max_depth,
+            args.workers,
+            args.max_per_host,
+            args.host_delay,
+        )
+        print("--- Crawl Complete ---")
+        print(f"Fetched {pages} pages, frontier: {frontier.stats()}")
+
+
+if __name__ == "__main__":
+    main()
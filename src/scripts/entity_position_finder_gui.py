@@ -2,10 +2,108 @@
 GUI application for finding positions of words in text.
 """
 
+import queue
 import re
+import threading
 import tkinter as tk
+from collections import defaultdict
+from pathlib import Path
 from tkinter import messagebox, scrolledtext, ttk
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+from product_recognition_service.annotation_store import AnnotationStore
+
+ANNOTATION_DB_PATH = Path(__file__).resolve().parents[2] / "data" / "processed" / "annotations.db"
+
+WORD_RE = re.compile(r"\w+")
+
+# How many results are moved from the worker queue into the Treeview per UI tick
+RESULTS_PER_TICK = 200
+POLL_INTERVAL_MS = 30
+
+
+class TextIndex:
+    """
+    Search index built once per text.
+
+    Keeps a lowercased copy of the text and a word index (lowercased word -> start offsets),
+    so that many terms can be looked up without rescanning the whole text for each of them.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        # str.lower() may change the length for some unicode characters, offsets are only
+        # shared between both copies when the lengths are equal
+        self.lower_aligned = len(self.lower) == len(text)
+        # Otherwise maps offsets of the lowercased copy to the text, -1 inside a character's lowercase form
+        self.lower_to_text: List[int] = []
+        if not self.lower_aligned:
+            for position, char in enumerate(text):
+                self.lower_to_text.extend([position] + [-1] * (len(char.lower()) - 1))
+            self.lower_to_text.append(len(text))
+
+        self.word_index: Dict[str, List[int]] = defaultdict(list)
+        for match in WORD_RE.finditer(self.lower):
+            self.word_index[match.group()].append(match.start())
+
+    def _is_word_boundary(self, pos: int) -> bool:
+        """Same semantics as regex \\b at the given offset."""
+        before = pos > 0 and (self.text[pos - 1].isalnum() or self.text[pos - 1] == "_")
+        after = pos < len(self.text) and (self.text[pos].isalnum() or self.text[pos] == "_")
+        return before != after
+
+    def find_whole_word(self, term: str, case_sensitive: bool) -> List[Tuple[int, int, str]]:
+        """Finds whole-word occurrences of the term using the word index."""
+        first_word = WORD_RE.match(term)
+        if not first_word or not self.lower_aligned:
+            # No usable word index for this term (or offsets differ in the lowercased copy),
+            # fall back to the regex scan
+            flags = 0 if case_sensitive else re.IGNORECASE
+            pattern = re.compile(r"\b" + re.escape(term) + r"\b", flags)
+            return [(m.start(), m.end(), m.group()) for m in pattern.finditer(self.text)]
+
+        haystack = self.text if case_sensitive else self.lower
+        needle = term if case_sensitive else term.lower()
+        positions = []
+        for start in self.word_index.get(first_word.group().lower(), ()):
+            end = start + len(needle)
+            if haystack.startswith(needle, start) and self._is_word_boundary(end):
+                positions.append((start, end, self.text[start:end]))
+        return positions
+
+    def find_substrings(self, terms: List[str], case_sensitive: bool) -> Iterator[Tuple[str, int, int, str]]:
+        """
+        Finds all (possibly overlapping) occurrences of all terms in a single pass over the text.
+
+        Yields (term, start, end, found_text) ordered by start offset.
+        """
+        keys = {term: term if case_sensitive else term.lower() for term in terms}
+        haystack = self.text if case_sensitive else self.lower
+
+        # Longest alternatives first, so the regex reports the longest term at each offset.
+        # Shorter terms matching at the same offset are exactly the prefixes of that term.
+        by_key: Dict[str, List[str]] = defaultdict(list)
+        for term, key in keys.items():
+            by_key[key].append(term)
+        ordered = sorted(by_key, key=len, reverse=True)
+        prefixes = {key: [other for other in ordered if other != key and key.startswith(other)] for key in ordered}
+
+        pattern = re.compile("(?=(" + "|".join(re.escape(key) for key in ordered) + "))")
+        for match in pattern.finditer(haystack):
+            start = match.start()
+            longest = match.group(1)
+            for key in [longest, *prefixes.get(longest, ())]:
+                end = start + len(key)
+                if not case_sensitive and not self.lower_aligned:
+                    # Matches that start or end inside the lowercase form of a character aren't in the text
+                    text_start, text_end = self.lower_to_text[start], self.lower_to_text[end]
+                    if text_start < 0 or text_end < 0:
+                        continue
+                else:
+                    text_start, text_end = start, end
+                for term in by_key.get(key, ()):
+                    yield term, text_start, text_end, self.text[text_start:text_end]
 
 
 class EntityPositionFinder:
@@ -16,6 +114,12 @@ class EntityPositionFinder:
 
         self.accumulated_entities = []
 
+        self._index: TextIndex | None = None
+        self._results_queue: queue.Queue = queue.Queue()
+        self._search_generation = 0
+        self._results_count = 0
+        self._first_result_shown = False
+
         style = ttk.Style()
         style.theme_use("clam")
 
@@ -52,6 +156,15 @@ class EntityPositionFinder:
         self.clear_button = ttk.Button(search_frame, text="Clear", command=self.clear_highlights)
         self.clear_button.grid(row=0, column=3)
 
+        ttk.Label(search_frame, text="Terms list\n(one per line):").grid(
+            row=2, column=0, sticky=tk.NW, padx=(0, 10), pady=(10, 0)
+        )
+        self.batch_terms_area = scrolledtext.ScrolledText(search_frame, wrap=tk.NONE, height=4, font=("Arial", 10))
+        self.batch_terms_area.grid(row=2, column=1, sticky="we", padx=(0, 10), pady=(10, 0))
+
+        self.batch_search_button = ttk.Button(search_frame, text="Search list", command=self.search_batch)
+        self.batch_search_button.grid(row=2, column=2, sticky=tk.N, padx=(0, 10), pady=(10, 0))
+
         options_frame = ttk.Frame(search_frame)
         options_frame.grid(row=1, column=0, columnspan=4, sticky=tk.W, pady=(10, 0))
 
@@ -69,7 +182,7 @@ class EntityPositionFinder:
         results_frame.columnconfigure(0, weight=1)
         results_frame.rowconfigure(0, weight=1)
 
-        columns = ("№", "Text", "Start", "End", "Length")
+        columns = ("№", "Text", "Start", "End", "Length", "Term")
         self.results_tree = ttk.Treeview(results_frame, columns=columns, show="headings", height=8)
 
         self.results_tree.heading("№", text="№")
@@ -77,12 +190,14 @@ class EntityPositionFinder:
         self.results_tree.heading("Start", text="Start")
         self.results_tree.heading("End", text="End")
         self.results_tree.heading("Length", text="Length")
+        self.results_tree.heading("Term", text="Search term")
 
         self.results_tree.column("№", width=50, anchor="center")
         self.results_tree.column("Text", width=300)
         self.results_tree.column("Start", width=100, anchor="center")
         self.results_tree.column("End", width=100, anchor="center")
         self.results_tree.column("Length", width=80, anchor="center")
+        self.results_tree.column("Term", width=150)
 
         scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.results_tree.yview)
         self.results_tree.configure(yscrollcommand=scrollbar.set)
@@ -134,7 +249,12 @@ class EntityPositionFinder:
         self.remove_selected_button = ttk.Button(
             collection_buttons_frame, text="Remove\nselected", command=self.remove_from_collection
         )
-        self.remove_selected_button.pack()
+        self.remove_selected_button.pack(pady=(0, 5))
+
+        self.save_collection_button = ttk.Button(
+            collection_buttons_frame, text="Save\nto store", command=self.save_collection_to_store
+        )
+        self.save_collection_button.pack()
 
         self.collection_count_label = ttk.Label(accumulated_frame, text="Collection is empty", font=("Arial", 9))
         self.collection_count_label.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
@@ -142,90 +262,169 @@ class EntityPositionFinder:
         self.text_area.tag_configure("highlight", background="yellow", foreground="black")
         self.text_area.tag_configure("selected", background="orange", foreground="black")
 
-    def find_positions(self, text: str, search_term: str) -> List[Tuple[int, int, str]]:
-        positions = []
+    def get_index(self, text: str) -> TextIndex:
+        """Returns the index for the text, rebuilding it only when the text has changed."""
+        index = self._index
+        if index is None or index.text != text:
+            index = TextIndex(text)
+            self._index = index
+        return index
 
+    def find_positions(self, text: str, search_term: str) -> List[Tuple[int, int, str]]:
         if not search_term:
-            return positions
+            return []
 
-        whole_word = self.whole_word_var.get()
-        case_sensitive = self.case_sensitive_var.get()
+        return [
+            (start, end, found_text)
+            for _, start, end, found_text in self.find_all_positions(
+                self.get_index(text), [search_term], self.whole_word_var.get(), self.case_sensitive_var.get()
+            )
+        ]
 
+    @staticmethod
+    def find_all_positions(
+        index: TextIndex, search_terms: List[str], whole_word: bool, case_sensitive: bool
+    ) -> Iterator[Tuple[str, int, int, str]]:
+        """Looks up many terms against one prebuilt index. Yields (term, start, end, found_text)."""
         if whole_word:
-            flags = 0 if case_sensitive else re.IGNORECASE
-            escaped_term = re.escape(search_term)
-            pattern = re.compile(r"\b" + escaped_term + r"\b", flags)
-
-            for match in pattern.finditer(text):
-                start = match.start()
-                end = match.end()
-                found_text = text[start:end]
-                positions.append((start, end, found_text))
+            for term in search_terms:
+                for start, end, found_text in index.find_whole_word(term, case_sensitive):
+                    yield term, start, end, found_text
         else:
-            if not case_sensitive:
-                text_lower = text.lower()
-                search_lower = search_term.lower()
-                start = 0
-                while True:
-                    pos = text_lower.find(search_lower, start)
-                    if pos == -1:
-                        break
-                    end = pos + len(search_term)
-                    found_text = text[pos:end]
-                    positions.append((pos, end, found_text))
-                    start = pos + 1
-            else:
-                start = 0
-                while True:
-                    pos = text.find(search_term, start)
-                    if pos == -1:
-                        break
-                    end = pos + len(search_term)
-                    found_text = text[pos:end]
-                    positions.append((pos, end, found_text))
-                    start = pos + 1
-
-        return positions
+            yield from index.find_substrings(search_terms, case_sensitive)
 
     def search(self):
+        self.run_search([self.search_entry.get().strip()])
+
+    def search_batch(self):
+        terms = self.batch_terms_area.get("1.0", tk.END).splitlines()
+        self.run_search(terms)
+
+    def run_search(self, raw_terms: List[str]):
         self.clear_highlights()
         for item in self.results_tree.get_children():
             self.results_tree.delete(item)
 
         text = self.text_area.get("1.0", tk.END).rstrip("\n")
-        search_term = self.search_entry.get().strip()
+        # Keep the order of the terms but drop empty lines and duplicates
+        search_terms = list(dict.fromkeys(term.strip() for term in raw_terms if term.strip()))
 
         if not text:
             messagebox.showwarning("Warning", "Please insert text for search")
             return
 
-        if not search_term:
+        if not search_terms:
             messagebox.showwarning("Warning", "Please insert word for search")
             return
 
-        positions = self.find_positions(text, search_term)
+        # Results of a previous search that is still running are dropped by the generation check
+        self._search_generation += 1
+        self._results_queue = queue.Queue()
+        self._results_count = 0
+        self._first_result_shown = False
+        self.stats_label.config(text="Searching...")
+
+        worker = threading.Thread(
+            target=self._search_worker,
+            args=(
+                self._search_generation,
+                self._results_queue,
+                text,
+                search_terms,
+                self.whole_word_var.get(),
+                self.case_sensitive_var.get(),
+            ),
+            daemon=True,
+        )
+        worker.start()
+        self.root.after(POLL_INTERVAL_MS, self._drain_results, self._search_generation, self._results_queue, search_terms)
+
+    def _search_worker(
+        self,
+        generation: int,
+        results_queue: queue.Queue,
+        text: str,
+        search_terms: List[str],
+        whole_word: bool,
+        case_sensitive: bool,
+    ):
+        """Runs in a background thread, so the Tk main loop keeps handling events."""
+        try:
+            index = self.get_index(text)
+            batch = []
+            for result in self.find_all_positions(index, search_terms, whole_word, case_sensitive):
+                if generation != self._search_generation:
+                    return
+                batch.append(result)
+                if len(batch) >= RESULTS_PER_TICK:
+                    results_queue.put(batch)
+                    batch = []
+            if batch:
+                results_queue.put(batch)
+        except Exception as e:
+            results_queue.put(e)
+        finally:
+            results_queue.put(None)
+
+    def _drain_results(self, generation: int, results_queue: queue.Queue, search_terms: List[str]):
+        """Moves results found so far from the worker queue into the UI."""
+        if generation != self._search_generation:
+            return
+
+        while True:
+            try:
+                batch = results_queue.get_nowait()
+            except queue.Empty:
+                self.stats_label.config(text=f"Searching... found: {self._results_count} matches")
+                self.root.after(POLL_INTERVAL_MS, self._drain_results, generation, results_queue, search_terms)
+                return
+
+            if batch is None:
+                self._finish_search(search_terms)
+                return
+            if isinstance(batch, Exception):
+                messagebox.showerror("Error", f"Search failed: {batch}")
+                continue
 
-        if not positions:
-            messagebox.showinfo("Result", f"Word '{search_term}' not found in text")
-            self.stats_label.config(text="Found: 0 matches")
+            self._show_results(batch)
+            # Give Tk a chance to redraw between batches
+            self.root.after(1, self._drain_results, generation, results_queue, search_terms)
             return
 
-        for i, (start, end, found_text) in enumerate(positions, 1):
+    def _show_results(self, batch: List[Tuple[str, int, int, str]]):
+        for term, start, end, found_text in batch:
+            self._results_count += 1
             self.results_tree.insert(
                 "",
                 "end",
-                values=(i, found_text if len(found_text) <= 50 else found_text[:47] + "...", start, end, end - start),
+                values=(
+                    self._results_count,
+                    found_text if len(found_text) <= 50 else found_text[:47] + "...",
+                    start,
+                    end,
+                    end - start,
+                    term,
+                ),
             )
 
             start_pos = self.text_area.index(f"1.0 + {start} chars")
             end_pos = self.text_area.index(f"1.0 + {end} chars")
             self.text_area.tag_add("highlight", start_pos, end_pos)
 
-        self.stats_label.config(text=f"Found: {len(positions)} matches")
+            if not self._first_result_shown:
+                self._first_result_shown = True
+                self.text_area.see(start_pos)
 
-        if positions:
-            first_start = positions[0][0]
-            self.text_area.see(f"1.0 + {first_start} chars")
+    def _finish_search(self, search_terms: List[str]):
+        if not self._results_count:
+            if len(search_terms) == 1:
+                messagebox.showinfo("Result", f"Word '{search_terms[0]}' not found in text")
+            else:
+                messagebox.showinfo("Result", f"None of {len(search_terms)} words found in text")
+            self.stats_label.config(text="Found: 0 matches")
+            return
+
+        self.stats_label.config(text=f"Found: {self._results_count} matches")
 
     def on_result_select(self, event):
         selection = self.results_tree.selection()
@@ -322,6 +521,28 @@ class EntityPositionFinder:
         self.root.clipboard_append(json_str)
         messagebox.showinfo("Success", f"Copied {len(self.accumulated_entities)} entities from collection")
 
+    def save_collection_to_store(self):
+        """Saves the collection as entities of the current text, touching only this one document."""
+        if not self.accumulated_entities:
+            messagebox.showwarning("Warning", "Collection is empty")
+            return
+
+        text = self.text_area.get("1.0", tk.END).rstrip("\n")
+        if not text:
+            messagebox.showwarning("Warning", "Please insert text for search")
+            return
+
+        with AnnotationStore(ANNOTATION_DB_PATH) as store:
+            document_id = store.find_document(text)
+            if document_id is None:
+                document_id = store.add_document(text, entities=self.accumulated_entities)
+            else:
+                store.add_entities(document_id, self.accumulated_entities)
+
+        messagebox.showinfo(
+            "Success", f"Saved {len(self.accumulated_entities)} entities to document #{document_id} in {ANNOTATION_DB_PATH.name}"
+        )
+
     def clear_collection(self):
         if not self.accumulated_entities:
             messagebox.showinfo("Information", "Collection is already empty")
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+from product_recognition_service.boilerplate import BoilerplateFilter, count_tokens
+from product_recognition_service.metrics import Metrics
+from product_recognition_service.url_processor import URLProcessor
+
+
+SOURCE_URL_PREFIX = "Source URL: "
+
+
+def page_url_from_filename(html_file: Path) -> str:
+    """
+    Rebuilds a URL usable as a sample key from a file saved by URLProcessor.process.
+
+    The saved file names are the URL without the scheme and with '/' replaced by '_',
+    so only the host part can be restored reliably - which is all the per-domain sample needs.
+    """
+    host, _, rest = html_file.stem.partition("_")
+    return f"https://{host}/{rest}"
+
+
+def page_url(html_file: Path, text_dir: Path | None) -> str | None:
+    """
+    Returns the URL of a page saved by URLProcessor.process.
+
+    The URL is read from the "Source URL:" line that ends the text file saved next to the
+    page. Returns None if there is no such text file.
+    """
+    if text_dir is None:
+        return None
+    text_file = text_dir / f"{html_file.stem}.txt"
+    try:
+        last_line = text_file.read_text(encoding="utf-8", errors="ignore").rstrip().rpartition("\n")[2]
+    except FileNotFoundError:
+        return None
+    if not last_line.startswith(SOURCE_URL_PREFIX):
+        return None
+    return last_line[len(SOURCE_URL_PREFIX):].strip() or None
+
+
+def learn_boilerplate(html_dir: Path, output_path: Path, text_dir: Path | None = None, window: int = 50):
+    """
+    Learns repeated text blocks per domain from crawled HTML pages.
+
+    Args:
+        html_dir: Directory with the HTML pages saved by process_all_urls.py.
+        output_path: Path of the boilerplate samples file loaded by the service.
+        text_dir: Directory with the text files saved alongside, the page URLs are read from them.
+            Pages without one are keyed by a URL rebuilt from the file name, whose host loses its port.
+        window: Number of sampled pages kept per domain.
+    """
+    html_files = sorted(html_dir.glob("*.html"))
+    if not html_files:
+        print(f"No HTML pages found in '{html_dir}'.")
+        return
+
+    boilerplate = BoilerplateFilter(Metrics(), window=window)
+    pages = []
+    rebuilt_urls = 0
+    for html_file in html_files:
+        url = page_url(html_file, text_dir)
+        if url is None:
+            url = page_url_from_filename(html_file)
+            rebuilt_urls += 1
+        blocks = URLProcessor._extract_blocks_from_html(html_file.read_text(encoding="utf-8", errors="ignore"))
+        boilerplate.observe(url, blocks)
+        pages.append((url, blocks))
+
+    tokens_in = 0
+    tokens_kept = 0
+    for url, blocks in pages:
+        tokens_in += count_tokens(blocks)
+        tokens_kept += count_tokens(boilerplate.filter(url, blocks) or blocks)
+
+    boilerplate.save(output_path)
+    print(f"Learned boilerplate from {len(pages)} pages, saved to '{output_path}'")
+    if rebuilt_urls:
+        print(f"{rebuilt_urls} pages had no text file with their source URL, their URL was rebuilt from the file name")
+    if tokens_in:
+        print(f"NER input on these pages: {tokens_in} -> {tokens_kept} tokens ({1 - tokens_kept / tokens_in:.1%} removed)")
+
+
+if __name__ == "__main__":
+    project_root = Path(__file__).resolve().parents[2]
+    learn_boilerplate(
+        project_root / "data" / "html_pages",
+        project_root / "data" / "processed" / "boilerplate.json",
+        project_root / "data" / "text_content",
+    )
@@ -0,0 +1,49 @@
+import argparse
+from pathlib import Path
+
+from product_recognition_service.annotation_store import AnnotationStore
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[2] / "data" / "processed" / "annotations.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, export and inspect the SQLite annotation store.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Path to the annotation store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_labeled = subparsers.add_parser("import-labeled", help="Import a labeled_data.json style file.")
+    import_labeled.add_argument("path", type=Path)
+
+    import_spacy = subparsers.add_parser("import-spacy", help="Import a spaCy training data JSON file.")
+    import_spacy.add_argument("path", type=Path)
+
+    export_labeled = subparsers.add_parser("export-labeled", help="Export to the labeled_data.json layout.")
+    export_labeled.add_argument("path", type=Path)
+
+    export_spacy = subparsers.add_parser("export-spacy", help="Export to the spaCy training data layout.")
+    export_spacy.add_argument("path", type=Path)
+
+    subparsers.add_parser("stats", help="Print document and annotation counts.")
+
+    args = parser.parse_args()
+
+    with AnnotationStore(args.db) as store:
+        if args.command == "import-labeled":
+            print(f"Imported {store.import_labeled_json(args.path)} new or changed documents into '{args.db}'")
+        elif args.command == "import-spacy":
+            print(f"Imported {store.import_spacy_json(args.path)} new or changed documents into '{args.db}'")
+        elif args.command == "export-labeled":
+            print(f"Exported {store.export_labeled_json(args.path)} documents to '{args.path}'")
+        elif args.command == "export-spacy":
+            print(f"Exported {store.export_spacy_json(args.path)} documents to '{args.path}'")
+        elif args.command == "stats":
+            total = store.count_documents()
+            processed = store.count_processed_documents()
+            print(f"Documents: {total}")
+            print(f"Annotated documents: {processed}")
+            print(f"Training documents: {store.count_training_documents()}")
+            print(f"Labels: {', '.join(store.labels()) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
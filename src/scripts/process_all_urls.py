@@ -1,35 +1,49 @@
+import argparse
 import csv
 import json
 import multiprocessing
+import time
 from functools import partial
 from pathlib import Path
 
+from product_recognition_service.crawl_telemetry import STAGES, CrawlTrace, classify_error, write_report
+from product_recognition_service.fetch_backend import FETCH_MODES, get_fetch_backend
 from product_recognition_service.url_processor import URLProcessor
 
 
-def process_single_url(url: str, html_dir: Path, text_dir: Path) -> tuple[bool, str, str | None]:
+def process_single_url(
+    url: str, html_dir: Path | None, text_dir: Path, fetch_mode: str = "live", archive_dir: Path | None = None
+) -> tuple[bool, str, str | None, dict]:
     """
     Processes a single URL. This function is designed to be called by a worker process.
 
     Args:
         url: The URL string to process.
-        html_dir: The directory where the HTML file will be saved.
+        html_dir: The directory where the HTML file will be saved (None to skip saving it).
         text_dir: The directory where the extracted text file will be saved.
+        fetch_mode: "live", "replay" (pages only from archive_dir) or "record" (saved to archive_dir).
+        archive_dir: The archive of HTML pages used by the "replay" and "record" modes.
 
     Returns:
         A tuple containing:
         - bool: True if the URL was processed successfully, False otherwise.
         - str: The original URL.
         - str | None: The extracted text if successful, otherwise None.
+        - dict: The crawl telemetry record of the URL: stage timings, bytes, status code and error class.
     """
+    trace = CrawlTrace(url)
     try:
-        processor = URLProcessor(url=url, html_output_dir=html_dir, text_output_dir=text_dir)
-        if processor.process():
-            return True, url, processor.text_content
-        return False, url, None
-    except Exception:
-        # logger.error(f"An unexpected error occurred for URL {url}: {e}", exc_info=True)
-        return False, url, None
+        # The backend is created inside the worker process, it is not shared between processes
+        fetch_backend = get_fetch_backend(fetch_mode, archive_dir)
+        processor = URLProcessor(
+            url=url, html_output_dir=html_dir, text_output_dir=text_dir, fetch_backend=fetch_backend
+        )
+        if processor.process(trace):
+            return True, url, processor.text_content, trace.finish()
+        return False, url, None, trace.finish()
+    except Exception as e:
+        trace.fail(classify_error(e), f"{type(e).__name__}: {e}")
+        return False, url, None, trace.finish()
 
 
 def read_urls_from_csv(file_path: Path) -> list[str]:
@@ -78,7 +92,14 @@ def save_to_json(data: list[dict], output_file: Path):
         print(f"Could not write to JSON file {output_file}: {e}")
 
 
-def process_all_urls(urls: list[str], html_dir: Path, text_dir: Path, annotation_file: Path):
+def process_all_urls(
+    urls: list[str],
+    html_dir: Path,
+    text_dir: Path,
+    annotation_file: Path,
+    fetch_mode: str = "live",
+    report_dir: Path | None = None,
+):
     """
     Processes a list of URLs, saving their HTML and extracted text content.
 
@@ -87,6 +108,11 @@ def process_all_urls(urls: list[str], html_dir: Path, text_dir: Path, annotation
         html_dir: The directory where HTML files will be saved.
         text_dir: The directory where extracted text files will be saved.
         annotation_file: The path to save the JSON file for annotation.
+        fetch_mode: "live" fetches over the network, "replay" re-processes the pages
+            already saved in html_dir without any network access, "record" fetches
+            over the network and saves the pages to html_dir.
+        report_dir: The directory for the crawl telemetry: per-URL records (JSONL) and a
+            report with percentiles by stage and by host (JSON). Not written if None.
     """
     if not urls:
         print("URL list is empty. Nothing to process.")
@@ -100,14 +126,23 @@ def process_all_urls(urls: list[str], html_dir: Path, text_dir: Path, annotation
 
     total_urls = len(urls)
 
-    task_processor = partial(process_single_url, html_dir=html_dir, text_dir=text_dir)
+    # In replay mode html_dir is the archive being read, in record mode the backend saves the pages to it
+    task_processor = partial(
+        process_single_url,
+        html_dir=None if fetch_mode in ("replay", "record") else html_dir,
+        text_dir=text_dir,
+        fetch_mode=fetch_mode,
+        archive_dir=html_dir,
+    )
 
     with multiprocessing.Pool() as pool:
         results = pool.map(task_processor, urls)
 
     success_count = 0
     annotation_data = []
-    for success, url, text in results:
+    records = []
+    for success, url, text, record in results:
+        records.append(record)
         if success and text:
             success_count += 1
             annotation_data.append({"source_url": url, "text": text, "entits": []})
@@ -121,17 +156,61 @@ def process_all_urls(urls: list[str], html_dir: Path, text_dir: Path, annotation
     if annotation_data:
         save_to_json(annotation_data, annotation_file)
 
+    if report_dir:
+        print_crawl_report(records, report_dir)
+
+
+def print_crawl_report(records: list[dict], report_dir: Path):
+    """
+    Writes the crawl telemetry and prints where the crawl time went.
+
+    Args:
+        records: The telemetry records of the processed URLs.
+        report_dir: The directory the records and the aggregated report are written to.
+    """
+    run_name = time.strftime("%Y%m%d-%H%M%S")
+    records_path = report_dir / f"crawl_{run_name}.jsonl"
+    report_path = report_dir / f"crawl_{run_name}_report.json"
+    report = write_report(records, records_path, report_path)
+
+    print("--- Crawl Telemetry (seconds) ---")
+    print(f"{'stage':<12}{'p50':>10}{'p90':>10}{'p99':>10}{'sum':>12}")
+    for stage in (*STAGES, "total"):
+        summary = report["total"] if stage == "total" else report["stages"][stage]
+        if summary["count"]:
+            print(f"{stage:<12}{summary['p50']:>10.3f}{summary['p90']:>10.3f}{summary['p99']:>10.3f}{summary['sum']:>12.1f}")
+    if report["errors"]:
+        print("Failures: " + ", ".join(f"{error} {count}" for error, count in report["errors"].items()))
+    slowest_hosts = list(report["hosts"].items())[:5]
+    if slowest_hosts:
+        print("Slowest hosts: " + ", ".join(
+            f"{host} ({info['total']['sum']:.1f}s, mostly {info['slowest_stage']})" for host, info in slowest_hosts
+        ))
+    print(f"Saved crawl telemetry to '{records_path}' and '{report_path}'")
+
 
 def main():
     project_root = Path(__file__).resolve().parents[2]
-    csv_file_path = project_root / "data" / "URL_list.csv"
-    html_output_dir = project_root / "data" / "html_pages"
-    text_output_dir = project_root / "data" / "text_content"
+    parser = argparse.ArgumentParser(description="Fetch the URLs from a CSV file and extract their text.")
+    parser.add_argument("--csv", type=Path, default=project_root / "data" / "URL_list.csv")
+    parser.add_argument(
+        "--fetch-mode",
+        choices=FETCH_MODES,
+        default="live",
+        help="'replay' re-processes the archived pages offline, 'record' refreshes the archive.",
+    )
+    parser.add_argument("--archive-dir", type=Path, default=project_root / "data" / "html_pages")
+    parser.add_argument("--text-dir", type=Path, default=project_root / "data" / "text_content")
+    parser.add_argument("--report-dir", type=Path, default=project_root / "data" / "crawl_reports")
+    args = parser.parse_args()
+
     print("Starting")
-    urls_to_process = read_urls_from_csv(csv_file_path)
+    urls_to_process = read_urls_from_csv(args.csv)
     if urls_to_process:
         output_file = project_root / f"new_annotation_data_{len(urls_to_process)}_entries.json"
-        process_all_urls(urls_to_process, html_output_dir, text_output_dir, output_file)
+        process_all_urls(
+            urls_to_process, args.archive_dir, args.text_dir, output_file, args.fetch_mode, args.report_dir
+        )
 
 
 if __name__ == "__main__":
@@ -1,21 +1,43 @@
+import argparse
 import json
 import logging
+import os
 import random
+import shutil
+import uuid
 from pathlib import Path
+from typing import Callable, Iterable
 
 import spacy
 from spacy.training.example import Example
 
+from product_recognition_service.annotation_store import AnnotationStore
+from product_recognition_service.extractor import MODEL_ID_META_KEY
 from product_recognition_service.logging_setup import setup_logging
 
 TRAIN_DATA_PATH = Path(__file__).resolve().parents[2] / "data" / "processed" / "spacy_training_data.json"
+ANNOTATION_DB_PATH = Path(__file__).resolve().parents[2] / "data" / "processed" / "annotations.db"
 MODEL_OUTPUT_DIR = Path(__file__).resolve().parents[2] / "models" / "product_ner_model"
+CHECKPOINT_DIR = Path(__file__).resolve().parents[2] / "models" / "checkpoints"
+CHECKPOINT_STATE_FILE = "state.json"
 N_ITER = 50
+N_ITER_INCREMENTAL = 10
+# Model meta key holding the annotation store revision the model was trained up to
+ANNOTATIONS_REVISION_META_KEY = "annotations_revision"
 
 logger = logging.getLogger(__name__)
 
-def train_spacy_ner_model():
-    """Trains a new spaCy NER model on the product data."""
+def load_training_data() -> tuple[set[str], Callable[[], Iterable[tuple[str, dict]]]] | None:
+    """
+    Returns the entity labels and a function producing the shuffled examples for one epoch.
+
+    The annotation store is preferred: examples are streamed from it in random order on
+    every epoch. Otherwise the whole spaCy-format JSON file is loaded into memory.
+    """
+    if ANNOTATION_DB_PATH.exists():
+        store = AnnotationStore(ANNOTATION_DB_PATH)
+        logger.info(f"Streaming training data from annotation store '{ANNOTATION_DB_PATH}'")
+        return set(store.labels()), lambda: store.iter_spacy_examples(shuffle=True)
 
     try:
         with open(TRAIN_DATA_PATH, 'r', encoding='utf-8') as f:
@@ -23,13 +45,174 @@ def train_spacy_ner_model():
     except FileNotFoundError:
         logger.error(f"Error: Training data file '{TRAIN_DATA_PATH}' not found.")
         logger.error("Please run the data preparation script first.")
-        return
+        return None
     except json.JSONDecodeError:
         logger.error(f"Error: Could not decode JSON from '{TRAIN_DATA_PATH}'.")
-        return
+        return None
+
+    def shuffled_examples():
+        random.shuffle(TRAIN_DATA)
+        return TRAIN_DATA
+
+    labels = {ent[2] for _, annotations in TRAIN_DATA for ent in annotations.get("entities")}
+    return labels, shuffled_examples
+
+
+def load_json_examples(path: Path) -> list[tuple[str, dict]] | None:
+    """Loads examples from a spaCy-format JSON file."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [(text, annotations) for text, annotations in json.load(f)]
+    except FileNotFoundError:
+        logger.error(f"Error: Training data file '{path}' not found.")
+    except json.JSONDecodeError:
+        logger.error(f"Error: Could not decode JSON from '{path}'.")
+    return None
+
+
+def load_incremental_training_data(
+    base_meta: dict, new_data_path: Path | None, replay_ratio: float
+) -> tuple[set[str], Callable[[], Iterable[tuple[str, dict]]], int | None] | None:
+    """
+    Returns the entity labels, a function producing the examples for one epoch and the
+    annotation store revision the resulting model is up to date with.
+
+    New examples are read from `new_data_path` if given, otherwise they are the store
+    documents changed after the revision recorded in the meta of the base model; without
+    that record the new documents are unknown and no training is done.
+    Every epoch mixes all new examples with a fresh random sample of `replay_ratio` times
+    as many old examples, so the model doesn't forget what it learned before.
+    """
+    store = AnnotationStore(ANNOTATION_DB_PATH) if ANNOTATION_DB_PATH.exists() else None
+    last_revision = store.last_revision() if store else None
+    annotations_revision = base_meta.get(ANNOTATIONS_REVISION_META_KEY)
+
+    if new_data_path is not None:
+        new_examples = load_json_examples(new_data_path)
+        if new_examples is None:
+            return None
+        # The whole store counts as old, the model is not up to date with newer store changes
+        old_until = last_revision
+        trained_until = annotations_revision
+    elif store is not None:
+        if annotations_revision is None:
+            logger.error(
+                "Error: The model meta doesn't record the annotation store revision it was trained up to, "
+                "so the new documents are unknown. Train a full model or pass --new-data."
+            )
+            return None
+        new_examples = list(store.iter_spacy_examples(revision_after=annotations_revision))
+        old_until = annotations_revision
+        trained_until = last_revision
+    else:
+        logger.error("Incremental training needs new examples: pass --new-data or use the annotation store.")
+        return None
+
+    if not new_examples:
+        logger.info("No new examples since the base model was trained, nothing to do.")
+        return None
+
+    if store is not None:
+        def sample_old(n):
+            if old_until is None:
+                return []
+            return list(store.iter_spacy_examples(shuffle=True, revision_until=old_until, limit=n))
+    else:
+        old_examples = load_json_examples(TRAIN_DATA_PATH) or []
 
-    nlp = spacy.blank("en")
-    logger.info("Created blank 'en' model")
+        def sample_old(n):
+            return random.sample(old_examples, min(n, len(old_examples)))
+
+    replay_size = round(len(new_examples) * replay_ratio)
+    logger.info(f"Fine-tuning on {len(new_examples)} new examples plus {replay_size} replayed old examples per epoch")
+
+    def mixed_examples():
+        examples = new_examples + sample_old(replay_size)
+        random.shuffle(examples)
+        return examples
+
+    labels = {ent[2] for _, annotations in new_examples for ent in annotations.get("entities")}
+    return labels, mixed_examples, trained_until
+
+
+def load_checkpoint(checkpoint_dir: Path, mode: str) -> tuple[spacy.language.Language, dict] | None:
+    """Loads the model and state of an interrupted run of the same training mode."""
+    state_path = checkpoint_dir / CHECKPOINT_STATE_FILE
+    if not state_path.exists():
+        return None
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get("mode") != mode:
+        logger.info(f"Ignoring the checkpoint in '{checkpoint_dir}' left by a '{state.get('mode')}' run")
+        return None
+    return spacy.load(checkpoint_dir / state["model"]), state
+
+
+def save_checkpoint(nlp: spacy.language.Language, checkpoint_dir: Path, mode: str, epoch: int):
+    """
+    Saves the model after an epoch into its own directory. The state file is switched to it
+    only afterwards, so it always points to a complete model, then older epochs are removed.
+    """
+    model_dir = f"epoch-{epoch}"
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    nlp.to_disk(checkpoint_dir / model_dir)
+    tmp_path = checkpoint_dir / f"{CHECKPOINT_STATE_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"mode": mode, "epoch": epoch, "model": model_dir}, f)
+    os.replace(tmp_path, checkpoint_dir / CHECKPOINT_STATE_FILE)
+    for previous in checkpoint_dir.glob("epoch-*"):
+        if previous.name != model_dir:
+            shutil.rmtree(previous, ignore_errors=True)
+
+
+def train_spacy_ner_model(
+    incremental: bool = False,
+    n_iter: int | None = None,
+    new_data_path: Path | None = None,
+    replay_ratio: float = 1.0,
+    checkpoint_dir: Path = CHECKPOINT_DIR,
+):
+    """
+    Trains a spaCy NER model on the product data.
+
+    By default a new model is trained from scratch on the full dataset. With `incremental`
+    the model in MODEL_OUTPUT_DIR is fine-tuned on new plus replayed old examples instead.
+    The model is checkpointed after every epoch; an interrupted run of the same mode
+    continues from its last checkpoint.
+    """
+    mode = "incremental" if incremental else "full"
+    n_iter = n_iter or (N_ITER_INCREMENTAL if incremental else N_ITER)
+    annotations_revision = None
+
+    if incremental:
+        if not MODEL_OUTPUT_DIR.exists():
+            logger.error(f"Error: No model to fine-tune in '{MODEL_OUTPUT_DIR}'. Train a full model first.")
+            return
+        base_meta = spacy.util.load_meta(MODEL_OUTPUT_DIR / "meta.json")
+        training_data = load_incremental_training_data(base_meta, new_data_path, replay_ratio)
+        if training_data is None:
+            return
+        labels, examples_for_epoch, annotations_revision = training_data
+    else:
+        training_data = load_training_data()
+        if training_data is None:
+            return
+        labels, examples_for_epoch = training_data
+        if ANNOTATION_DB_PATH.exists():
+            annotations_revision = AnnotationStore(ANNOTATION_DB_PATH).last_revision()
+
+    start_epoch = 0
+    checkpoint = load_checkpoint(checkpoint_dir, mode)
+    if checkpoint is not None:
+        nlp, state = checkpoint
+        start_epoch = state["epoch"]
+        logger.info(f"Resuming {mode} training from the checkpoint after epoch {start_epoch}/{n_iter}")
+    elif incremental:
+        nlp = spacy.load(MODEL_OUTPUT_DIR)
+        logger.info(f"Loaded model from '{MODEL_OUTPUT_DIR}' to fine-tune")
+    else:
+        nlp = spacy.blank("en")
+        logger.info("Created blank 'en' model")
 
     # Add the NER (Named Entity Recognition) component to the pipeline
     if "ner" not in nlp.pipe_names:
@@ -39,20 +222,23 @@ def train_spacy_ner_model():
 
     # Add the "PRODUCT" label to the NER component
     # spaCy requires all labels to be added before training
-    for _, annotations in TRAIN_DATA:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
+    for label in labels:
+        ner.add_label(label)
 
     # 3. Train the model
     other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
     with nlp.select_pipes(disable=other_pipes):  # only train NER
-        optimizer = nlp.begin_training()
+        # Trained weights (base model or checkpoint) are kept, a blank model is initialized.
+        # The optimizer state is not checkpointed, a resumed run starts a fresh optimizer.
+        if incremental or checkpoint is not None:
+            optimizer = nlp.resume_training()
+        else:
+            optimizer = nlp.begin_training()
         logger.info("Starting training...")
-        for itn in range(N_ITER):
-            random.shuffle(TRAIN_DATA)
+        for itn in range(start_epoch, n_iter):
             losses = {}
             # Batch up the examples using spaCy's minibatch
-            batches = spacy.util.minibatch(TRAIN_DATA, size=32)
+            batches = spacy.util.minibatch(examples_for_epoch(), size=32)
             for batch in batches:
                 examples = []
                 for text, annotations in batch:
@@ -64,14 +250,35 @@ def train_spacy_ner_model():
                     sgd=optimizer,
                     losses=losses,
                 )
-            logger.info(f"Iteration {itn + 1}/{N_ITER}, Losses: {losses}")
+            logger.info(f"Iteration {itn + 1}/{n_iter}, Losses: {losses}")
+            save_checkpoint(nlp, checkpoint_dir, mode, itn + 1)
 
     # 4. Save the trained model
+    if annotations_revision is not None:
+        nlp.meta[ANNOTATIONS_REVISION_META_KEY] = annotations_revision
+    nlp.meta[MODEL_ID_META_KEY] = uuid.uuid4().hex
     nlp.to_disk(MODEL_OUTPUT_DIR)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
     logger.info(f"\nModel trained and saved to '{MODEL_OUTPUT_DIR}'")
     logger.info("You can now use this model to find product entities in your text.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the product NER model.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fine-tune the current model on new annotations instead of training from scratch.",
+    )
+    parser.add_argument("--n-iter", type=int, help=f"Epochs (default {N_ITER}, {N_ITER_INCREMENTAL} with --incremental).")
+    parser.add_argument(
+        "--new-data", type=Path, help="spaCy-format JSON with the new examples (default: store changes since the model)."
+    )
+    parser.add_argument(
+        "--replay-ratio", type=float, default=1.0, help="Old examples replayed per new example in every epoch."
+    )
+    parser.add_argument("--checkpoint-dir", type=Path, default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
     setup_logging()
     print("Starting training...")
-    train_spacy_ner_model() 
\ No newline at end of file
+    train_spacy_ner_model(args.incremental, args.n_iter, args.new_data, args.replay_ratio, args.checkpoint_dir)
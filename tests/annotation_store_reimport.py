@@ -0,0 +1,49 @@
+"""
+Script for checking that importing the same annotations into the annotation store twice
+changes nothing: no duplicate documents, no new revisions. Run with src on PYTHONPATH.
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from product_recognition_service.annotation_store import AnnotationStore
+
+LABELED_DATA = [
+    {
+        "source_url": "https://shop.com/oak-table",
+        "text": "Oak Table by Acme",
+        "entities": [{"start": 0, "end": 9, "label": "PRODUCT", "text": "Oak Table"}, {"text": "incomplete"}],
+    },
+    {"source_url": "https://shop.com/about", "text": "About us", "entities": []},
+    {"source_url": "https://shop.com/cart", "text": "Your cart", "entits": []},
+]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        labeled_path = tmp_dir / "labeled_data.json"
+        labeled_path.write_text(json.dumps(LABELED_DATA), encoding="utf-8")
+
+        with AnnotationStore(tmp_dir / "annotations.db") as store:
+            first = store.import_labeled_json(labeled_path)
+            state = (store.count_documents(), store.last_revision(), list(store.iter_documents()))
+
+            again = store.import_labeled_json(labeled_path)
+            store.export_labeled_json(tmp_dir / "export.json")
+            from_export = store.import_labeled_json(tmp_dir / "export.json")
+            store.export_spacy_json(tmp_dir / "spacy.json")
+            from_spacy = store.import_spacy_json(tmp_dir / "spacy.json")
+            after = (store.count_documents(), store.last_revision(), list(store.iter_documents()))
+
+    print(f"Imported: {first}, then {again} + {from_export} (labeled export) + {from_spacy} (spaCy export)")
+    print(f"Documents / last revision: {state[:2]} -> {after[:2]}")
+    ok = first == 3 and again == from_export == from_spacy == 0 and state == after
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 """
-Script for counting the number of processed sites in the annotation JSON file.
+Script for counting the number of processed sites in the annotation store or the annotation JSON file.
 A site is considered processed if it has at least one entity with valid start and end positions.
 """
 
@@ -7,6 +7,8 @@ import json
 import sys
 from pathlib import Path
 
+from product_recognition_service.annotation_store import AnnotationStore
+
 
 def count_processed_sites(json_file_path):
     """
@@ -78,18 +80,42 @@ def count_processed_sites(json_file_path):
     return total_sites, processed_sites, percentage
 
 
+def count_processed_sites_in_store(db_path):
+    """
+    Counts the number of processed sites in the annotation store with indexed queries.
+
+    Args:
+        db_path (Path): Path to the SQLite annotation store
+
+    Returns:
+        tuple: (total_sites, processed_sites, percentage_processed)
+    """
+    with AnnotationStore(db_path) as store:
+        total_sites = store.count_documents()
+        processed_sites = store.count_processed_documents()
+
+    percentage = (processed_sites / total_sites * 100) if total_sites > 0 else 0
+
+    return total_sites, processed_sites, percentage
+
+
 def main():
-    json_file = Path(__file__).resolve().parents[1] / "data" / "processed" / "labeled_data.json"
-    
-    if not Path(json_file).exists():
-        print(f"File {json_file} not found in the current directory")
+    data_dir = Path(__file__).resolve().parents[1] / "data" / "processed"
+    db_file = data_dir / "annotations.db"
+    json_file = data_dir / "labeled_data.json"
+
+    if db_file.exists():
+        print(f"Analyzing annotation store: {db_file}")
+        print("=" * 50)
+        result = count_processed_sites_in_store(db_file)
+    elif json_file.exists():
+        print(f"Analyzing file: {json_file}")
+        print("=" * 50)
+        result = count_processed_sites(json_file)
+    else:
+        print(f"Neither {db_file} nor {json_file} found")
         sys.exit(1)
     
-    print(f"Analyzing file: {json_file}")
-    print("=" * 50)
-    
-    result = count_processed_sites(json_file)
-    
     if result is None:
         sys.exit(1)
     
@@ -0,0 +1,96 @@
+"""
+Script for checking the crawl frontier against a local stand-in store, without network access.
+The store has a sitemap index, product pages reachable only through the sitemap or links,
+duplicate spellings of the same URLs and a link loop. Run with src on PYTHONPATH.
+"""
+
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "scripts"))
+
+from crawl import crawl, seed_frontier  # noqa: E402
+
+from product_recognition_service.crawl_frontier import CrawlFrontier  # noqa: E402
+from product_recognition_service.fetch_backend import LiveFetchBackend  # noqa: E402
+
+PRODUCTS = [f"product-{i}" for i in range(20)]
+
+
+class LocalStoreHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        base = f"http://{self.headers['Host']}"
+        path = self.path.split("?")[0].rstrip("/") or "/"
+        if path == "/sitemap.xml":
+            body = (
+                '<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"<sitemap><loc>{base}/sitemap-products.xml</loc></sitemap></sitemapindex>"
+            )
+            return self._respond(body, "application/xml")
+        if path == "/sitemap-products.xml":
+            # Only the first half of the products is listed, the rest is found through links
+            urls = "".join(f"<url><loc>{base}/products/{name}</loc></url>" for name in PRODUCTS[:10])
+            body = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+            return self._respond(body, "application/xml")
+        if path == "/":
+            links = "".join(f'<a href="/products/{name}/">{name}</a>' for name in PRODUCTS[10:])
+            links += '<a href="/?">Home</a><a href="/cart">Cart</a><a href="/logo.png">Logo</a>'
+            links += '<a href="https://example.com/">Other site</a>'
+            return self._respond(f"<html><body><nav>{links}</nav></body></html>")
+        if path.startswith("/products/"):
+            name = path.rsplit("/", 1)[-1]
+            # Every product links back home and to the other products with a fragment (all already seen)
+            links = '<a href="/">Home</a>' + "".join(f'<a href="/products/{other}#top">x</a>' for other in PRODUCTS)
+            return self._respond(f"<html><body><h1>Oak Table {name}</h1>{links}</body></html>")
+        self.send_response(404)
+        self.end_headers()
+
+    def _respond(self, body: str, content_type: str = "text/html"):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalStoreHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    homepage = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        db_path = tmp_dir / "frontier.db"
+        with CrawlFrontier(db_path) as frontier:
+            seed_frontier(frontier, [homepage])
+            # Stop early to check that the frontier survives a restart
+            first_run = crawl(
+                frontier, LiveFetchBackend(), tmp_dir / "html", tmp_dir / "text", max_pages=5, host_delay=0.05
+            )
+
+        with CrawlFrontier(db_path) as frontier:
+            print(f"Seeds re-added after restart: {seed_frontier(frontier, [homepage])}")
+            second_run = crawl(
+                frontier, LiveFetchBackend(), tmp_dir / "html", tmp_dir / "text", max_pages=100, host_delay=0.05
+            )
+            stats = frontier.stats()
+
+        saved_products = len(list((tmp_dir / "text").glob("*products_product-*.txt")))
+        print(f"Pages fetched: {first_run} + {second_run}, product pages saved: {saved_products}/{len(PRODUCTS)}")
+        print(f"Frontier: {stats}")
+        ok = first_run + second_run == len(PRODUCTS) + 1 and saved_products == len(PRODUCTS)
+        print("OK" if ok else "FAILED")
+
+    server.shutdown()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+Script for checking that the crawl frontier spreads claimed batches across hosts,
+so one large store can't take a whole batch of the crawler threads. Run with src on PYTHONPATH.
+"""
+
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from product_recognition_service.crawl_frontier import CrawlFrontier
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        with CrawlFrontier(Path(tmp) / "frontier.db") as frontier:
+            # The large host is added first and its product pages outrank the other hosts' pages
+            frontier.add_many([f"https://big.com/products/item-{i}" for i in range(100)])
+            for host in ("a.com", "b.com", "c.com"):
+                frontier.add_many([f"https://{host}/page-{i}" for i in range(10)])
+
+            batch = frontier.claim(16, per_host=2)
+            hosts = Counter(item["url"].split("/")[2] for item in batch)
+            print(f"Capped batch: {dict(hosts)}")
+            ok = hosts == {"big.com": 2, "a.com": 2, "b.com": 2, "c.com": 2}
+
+            batch = frontier.claim(8)
+            hosts = Counter(item["url"].split("/")[2] for item in batch)
+            first_hosts = [item["url"].split("/")[2] for item in batch[:4]]
+            print(f"Uncapped batch: {dict(hosts)}, first four: {first_hosts}")
+            ok = ok and len(hosts) == 4 and len(set(first_hosts)) == 4
+
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
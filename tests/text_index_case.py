@@ -0,0 +1,36 @@
+"""
+Script for checking the case-insensitive search of the entity finder's TextIndex on
+non-ASCII case pairs, including text whose lowercased copy is longer than the text
+('İ' lowercases to two characters). Run with src on PYTHONPATH.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "scripts"))
+
+from entity_position_finder_gui import TextIndex  # noqa: E402
+
+CASES = [
+    # (text, term, expected (start, end, found text) of a case-insensitive substring search)
+    ("İa AA  i", "İ", [(0, 1, "İ")]),
+    ("Kaufen Sie İstanbul Teppich, İSTANBUL", "İstanbul", [(11, 19, "İstanbul"), (29, 37, "İSTANBUL")]),
+    ("Äpfel und äpfel", "äpfel", [(0, 5, "Äpfel"), (10, 15, "äpfel")]),
+    ("Ωμέγα ΩΜΈΓΑ", "ωμέγα", [(0, 5, "Ωμέγα"), (6, 11, "ΩΜΈΓΑ")]),
+]
+
+
+def main():
+    ok = True
+    for text, term, expected in CASES:
+        index = TextIndex(text)
+        found = [(start, end, found_text) for _, start, end, found_text in index.find_substrings([term], False)]
+        whole_word = index.find_whole_word(term, False)
+        print(f"{text!r} / {term!r} (aligned: {index.lower_aligned}): {found}, whole word: {whole_word}")
+        ok = ok and found == expected
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())